@@ -1,31 +1,13 @@
 import streamlit as st
-import pandas as pd
-import json
+from menu_tables import build_nutrition_table_with_ingredients, format_ingredient_columns
+from data_cache import get_engine, cache_stats
 
-# 加載菜譜數據
-def load_recipes():
-    with open("recipes.json", "r", encoding="utf-8") as file:
-        return json.load(file)
-
-# 加載食材營養數據
-def load_nutrition_data():
-    with open("ingredients_nutrition.json", "r", encoding="utf-8") as file:
-        return json.load(file)
-
-# 計算營養成分
-def calculate_recipe_nutrition(ingredients, nutrition_data):
-    total_nutrition = {"熱量": 0, "蛋白質": 0, "脂肪": 0, "碳水化合物": 0}
-    for ingredient, weight in ingredients.items():
-        if ingredient in nutrition_data:
-            nutrient = nutrition_data[ingredient]
-            total_nutrition["熱量"] += nutrient["calories"] * weight / 100
-            total_nutrition["蛋白質"] += nutrient["protein"] * weight / 100
-            total_nutrition["脂肪"] += nutrient["fat"] * weight / 100
-            total_nutrition["碳水化合物"] += nutrient["carbs"] * weight / 100
-    return {key: round(value, 1) for key, value in total_nutrition.items()}
+# 加載營養索引（菜譜或營養數據更新時自動重建）
+def load_nutrition_engine():
+    return get_engine()
 
 # 計算菜單
-def calculate_menu(recipes, group_counts, lunch_calories, nutrition_data):
+def calculate_menu(recipes, group_counts, lunch_calories, engine):
     total_people = sum(group_counts.values())
     total_calories_needed = sum(count * lunch_calories[group] for group, count in group_counts.items())
     category_ratios = {"主食": 0.3, "主菜": 0.4, "副菜": 0.2, "湯品": 0.1}
@@ -38,7 +20,7 @@ def calculate_menu(recipes, group_counts, lunch_calories, nutrition_data):
         if category not in category_calories:
             continue
 
-        recipe_nutrition = calculate_recipe_nutrition(recipe["ingredients"], nutrition_data)
+        recipe_nutrition = engine.recipe_nutrition(recipe)
         if recipe_nutrition["熱量"] == 0:
             continue
         portions = round(category_calories[category] / recipe_nutrition["熱量"], 1)
@@ -58,60 +40,12 @@ def calculate_menu(recipes, group_counts, lunch_calories, nutrition_data):
     
     return menu_summary
 
-# 構建營養成分和分列食材數量表格
-def build_nutrition_table_with_ingredients(menu):
-    # 提取所有食材
-    all_ingredients = set()
-    for item in menu:
-        all_ingredients.update(item["ingredients"].keys())
-
-    rows = []
-    ingredient_totals = {ingredient: 0 for ingredient in all_ingredients}  # 初始化食材總計
-
-    for item in menu:
-        row = {
-            "菜品": item["name"],
-            "類型": item["type"],
-            "熱量 (kcal)": item["nutrition"]["熱量"],
-            "蛋白質 (g)": item["nutrition"]["蛋白質"],
-            "脂肪 (g)": item["nutrition"]["脂肪"],
-            "碳水化合物 (g)": item["nutrition"]["碳水化合物"],
-        }
-        # 將每個食材作為單獨的欄位
-        for ingredient in all_ingredients:
-            amount = item["ingredients"].get(ingredient, 0)
-            row[ingredient] = f"{amount} 克" if amount > 0 else "——"
-            ingredient_totals[ingredient] += amount  # 累加總計
-        rows.append(row)
-    
-    # 添加總計行
-    total_nutrition = {
-        "熱量 (kcal)": sum(row["熱量 (kcal)"] for row in rows),
-        "蛋白質 (g)": sum(row["蛋白質 (g)"] for row in rows),
-        "脂肪 (g)": sum(row["脂肪 (g)"] for row in rows),
-        "碳水化合物 (g)": sum(row["碳水化合物 (g)"] for row in rows),
-    }
-    total_row = {
-        "菜品": "總計",
-        "類型": "全部",
-        "熱量 (kcal)": round(total_nutrition["熱量 (kcal)"], 1),
-        "蛋白質 (g)": round(total_nutrition["蛋白質 (g)"], 1),
-        "脂肪 (g)": round(total_nutrition["脂肪 (g)"], 1),
-        "碳水化合物 (g)": round(total_nutrition["碳水化合物 (g)"], 1),
-    }
-    # 在總計行中添加食材總量
-    for ingredient, total_amount in ingredient_totals.items():
-        total_row[ingredient] = f"{round(total_amount, 1)} 克" if total_amount > 0 else "——"
-
-    rows.append(total_row)
-    return pd.DataFrame(rows)
-
 # 主應用
 def main():
     st.title("午餐菜單生成器")
 
-    recipes = load_recipes()
-    nutrition_data = load_nutrition_data()
+    engine = load_nutrition_engine()
+    recipes = engine.recipes
 
     st.sidebar.header("輸入用餐人數")
     group_counts = {
@@ -123,6 +57,10 @@ def main():
         "成人_女": st.sidebar.number_input("成人（女）人數", min_value=0, value=4),
     }
 
+    with st.sidebar.expander("快取狀態"):
+        for name, stats in cache_stats().items():
+            st.write(f"{name}：命中 {stats['hits']} 次，未命中 {stats['misses']} 次")
+
     calories_per_day = {
         "幼兒_男": 1400, "幼兒_女": 1300,
         "國小_男": 1800, "國小_女": 1600,
@@ -132,10 +70,10 @@ def main():
     lunch_calories = {group: int(cal * lunch_ratio) for group, cal in calories_per_day.items()}
 
     if st.button("生成菜單"):
-        menu = calculate_menu(recipes, group_counts, lunch_calories, nutrition_data)
+        menu = calculate_menu(recipes, group_counts, lunch_calories, engine)
         nutrition_table = build_nutrition_table_with_ingredients(menu)
         st.subheader("全餐營養成分與食材數量表（含總計）")
-        st.dataframe(nutrition_table)
+        st.dataframe(format_ingredient_columns(nutrition_table))
 
 if __name__ == "__main__":
     main()
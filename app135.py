@@ -1,158 +1,25 @@
-import streamlit as st
-import pandas as pd
 import json
-import random
 
-# 加載菜譜數據
-def load_recipes():
-    try:
-        with open("recipes.json", "r", encoding="utf-8") as file:
-            return json.load(file)
-    except json.JSONDecodeError as e:
-        st.error(f"解析 recipes.json 時發生錯誤：{e}")
-        st.stop()
-
-# 加載食材營養數據
-def load_nutrition_data():
+import streamlit as st
+from menu_tables import build_nutrition_table_with_ingredients, format_ingredient_columns
+from data_cache import get_engine, cache_stats
+from menu_export import EXPORT_FORMATS, available_formats, export_bytes, weekly_menu_tables
+from menu_planner import MenuPlan, new_seed
+from recipe_tags import DIET_EXCLUDES, excluded_tags
+
+# 加載營養索引（菜譜或營養數據更新時自動重建）
+def load_nutrition_engine():
     try:
-        with open("ingredients_nutrition.json", "r", encoding="utf-8") as file:
-            return json.load(file)
-    except json.JSONDecodeError as e:
-        st.error(f"解析 ingredients_nutrition.json 時發生錯誤：{e}")
+        return get_engine()
+    except ValueError as e:
+        st.error(f"載入 recipes.json 或 ingredients_nutrition.json 時發生錯誤：{e}")
         st.stop()
 
-# 計算營養成分
-def calculate_recipe_nutrition(ingredients, nutrition_data):
-    total_nutrition = {"熱量": 0, "蛋白質": 0, "脂肪": 0, "碳水化合物": 0}
-    for ingredient, weight in ingredients.items():
-        if ingredient in nutrition_data:
-            nutrient = nutrition_data[ingredient]
-            total_nutrition["熱量"] += nutrient["calories"] * weight / 100
-            total_nutrition["蛋白質"] += nutrient["protein"] * weight / 100
-            total_nutrition["脂肪"] += nutrient["fat"] * weight / 100
-            total_nutrition["碳水化合物"] += nutrient["carbs"] * weight / 100
-    return {key: round(value, 1) for key, value in total_nutrition.items()}
-
-# 計算單天菜單
-def calculate_menu_for_day(recipes, group_counts, lunch_calories, nutrition_data, day, used_recipes):
-    total_people = sum(group_counts.values())
-    total_calories_needed = sum(count * lunch_calories[group] for group, count in group_counts.items())
-    category_ratios = {"主食": 0.3, "主菜": 0.4, "副菜": 0.2, "湯品": 0.1}
-    category_calories = {category: total_calories_needed * ratio for category, ratio in category_ratios.items()}
-
-    # 按類型分類菜品
-    categorized_recipes = {category: [] for category in category_ratios.keys()}
-    for recipe in recipes:
-        if recipe["type"] in categorized_recipes and recipe not in used_recipes:
-            categorized_recipes[recipe["type"]].append(recipe)
-
-    menu_summary = []
-
-    for category, ratio in category_ratios.items():
-        # 主菜根據天數選擇肉品
-        if category == "主菜":
-            if day in [1, 3, 5]:  # 1, 3, 5 天使用豬肉
-                available_recipes = [r for r in categorized_recipes[category] if "豬肉" in r["ingredients"]]
-            elif day in [2, 4]:  # 2, 4 天使用雞肉
-                available_recipes = [r for r in categorized_recipes[category] if "雞肉" in r["ingredients"]]
-            else:
-                available_recipes = categorized_recipes[category]
-
-            # 如果無符合條件的主菜，回退到所有主菜中隨機選擇
-            if not available_recipes:
-                available_recipes = categorized_recipes[category]
-        else:
-            available_recipes = categorized_recipes.get(category, [])
-
-        if not available_recipes:
-            continue  # 如果該類型沒有菜品可選，跳過
-        selected_recipe = random.choice(available_recipes)
-
-        # 計算該菜品的營養成分和食材數量
-        recipe_nutrition = calculate_recipe_nutrition(selected_recipe["ingredients"], nutrition_data)
-        if recipe_nutrition["熱量"] == 0:
-            continue
-        portions = round(category_calories[category] / recipe_nutrition["熱量"], 1)
-        portions = min(portions, total_people)
-
-        total_ingredients = {ing: round(weight * portions, 1) for ing, weight in selected_recipe["ingredients"].items()}
-        total_nutrition = {key: round(value * portions, 1) for key, value in recipe_nutrition.items()}
-
-        menu_summary.append({
-            "name": selected_recipe["name"],
-            "type": selected_recipe["type"],
-            "calories": total_nutrition["熱量"],
-            "nutrition": total_nutrition,
-            "portions": portions,
-            "ingredients": total_ingredients
-        })
-
-        # 記錄已選菜品
-        used_recipes.append(selected_recipe)
-
-    return menu_summary
-
-# 為 5 天生成菜單
-def generate_weekly_menu(recipes, group_counts, lunch_calories, nutrition_data):
-    weekly_menu = {}
-    used_recipes = []  # 全局已使用菜品記錄
-
-    for day in range(1, 6):  # 1 到 5 天
-        daily_menu = calculate_menu_for_day(recipes, group_counts, lunch_calories, nutrition_data, day, used_recipes)
-        weekly_menu[f"Day {day}"] = daily_menu
-
-    return weekly_menu
-
-# 構建營養成分和食材數量表格
-def build_nutrition_table_with_ingredients(menu):
-    all_ingredients = set()
-    for item in menu:
-        all_ingredients.update(item["ingredients"].keys())
-
-    rows = []
-    ingredient_totals = {ingredient: 0 for ingredient in all_ingredients}
-
-    for item in menu:
-        row = {
-            "菜品": item["name"],
-            "類型": item["type"],
-            "熱量 (kcal)": item["nutrition"]["熱量"],
-            "蛋白質 (g)": item["nutrition"]["蛋白質"],
-            "脂肪 (g)": item["nutrition"]["脂肪"],
-            "碳水化合物 (g)": item["nutrition"]["碳水化合物"],
-        }
-        for ingredient in all_ingredients:
-            amount = item["ingredients"].get(ingredient, 0)
-            row[ingredient] = f"{amount} 克" if amount > 0 else "——"
-            ingredient_totals[ingredient] += amount
-        rows.append(row)
-    
-    total_nutrition = {
-        "熱量 (kcal)": sum(row["熱量 (kcal)"] for row in rows),
-        "蛋白質 (g)": sum(row["蛋白質 (g)"] for row in rows),
-        "脂肪 (g)": sum(row["脂肪 (g)"] for row in rows),
-        "碳水化合物 (g)": sum(row["碳水化合物 (g)"] for row in rows),
-    }
-    total_row = {
-        "菜品": "總計",
-        "類型": "全部",
-        "熱量 (kcal)": round(total_nutrition["熱量 (kcal)"], 1),
-        "蛋白質 (g)": round(total_nutrition["蛋白質 (g)"], 1),
-        "脂肪 (g)": round(total_nutrition["脂肪 (g)"], 1),
-        "碳水化合物 (g)": round(total_nutrition["碳水化合物 (g)"], 1),
-    }
-    for ingredient, total_amount in ingredient_totals.items():
-        total_row[ingredient] = f"{round(total_amount, 1)} 克" if total_amount > 0 else "——"
-    rows.append(total_row)
-
-    return pd.DataFrame(rows)
-
 # 主應用
 def main():
     st.title("週菜單生成器")
 
-    recipes = load_recipes()
-    nutrition_data = load_nutrition_data()
+    engine = load_nutrition_engine()
 
     st.sidebar.header("輸入用餐人數")
     group_counts = {
@@ -164,6 +31,10 @@ def main():
         "成人_女": st.sidebar.number_input("成人（女）人數", min_value=0, value=4),
     }
 
+    with st.sidebar.expander("快取狀態"):
+        for name, stats in cache_stats().items():
+            st.write(f"{name}：命中 {stats['hits']} 次，未命中 {stats['misses']} 次")
+
     calories_per_day = {
         "幼兒_男": 1400, "幼兒_女": 1300,
         "國小_男": 1800, "國小_女": 1600,
@@ -172,16 +43,87 @@ def main():
     lunch_ratio = 0.4
     lunch_calories = {group: int(cal * lunch_ratio) for group, cal in calories_per_day.items()}
 
-    if st.button("生成 5 天菜單"):
-        weekly_menu = generate_weekly_menu(recipes, group_counts, lunch_calories, nutrition_data)
+    st.sidebar.header("多週規劃")
+    weeks = st.sidebar.number_input("規劃週數", min_value=1, max_value=20, value=1)
+    repeat_days = st.sidebar.number_input("同一道菜間隔天數（0 表示整個計畫不重複）", min_value=0, value=0)
+    seed_input = st.sidebar.number_input("隨機種子（留空則自動產生）", min_value=0, value=None, step=1)
+    diets = st.sidebar.multiselect("飲食限制", list(DIET_EXCLUDES))
+    exclude_tags = st.sidebar.multiselect("排除食材（過敏原等）", engine.tags.tags)
+
+    if st.button("生成 5 天菜單" if weeks == 1 else f"生成 {weeks} 週菜單"):
+        plan = MenuPlan(engine, weeks, repeat_days or None, seed_input if seed_input is not None else new_seed(),
+                        excluded_tags(exclude_tags, diets))
+        plan.regenerate(group_counts, lunch_calories)
+        st.session_state["plan"] = plan
+
+    # 載入先前下載的計畫記錄（或批次輸出、API 回應中的 "plan_record"），還原每天的菜品後可繼續鎖定與替換
+    uploaded = st.sidebar.file_uploader("載入計畫記錄（JSON）", type="json")
+    if uploaded is not None and st.session_state.get("plan_upload") != uploaded.file_id:
+        st.session_state["plan_upload"] = uploaded.file_id
+        try:
+            record = json.load(uploaded)
+            st.session_state["plan"] = MenuPlan.from_record(engine, record.get("plan_record", record))
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            st.sidebar.error(f"無法載入計畫記錄：{e}")
+
+    plan = st.session_state.get("plan")
+    if plan is None or plan.engine is not engine:
+        return
+
+    st.caption(f"種子：{plan.seed}，數據版本：{engine.data_version}（輸入相同種子即可重現此計畫）")
+    st.download_button(
+        "下載計畫記錄（JSON）",
+        data=lambda: json.dumps(plan.to_record(), ensure_ascii=False, indent=2).encode("utf-8"),
+        file_name="menu_plan.json",
+        mime="application/json",
+        on_click="ignore",
+    )
+
+    # 只重新選擇未鎖定的天數；人數變動時沿用已選菜品，只重新計算份量
+    if st.button("重新生成未鎖定的天數"):
+        plan.regenerate(group_counts, lunch_calories)
+
+    for day in plan.days():
+        st.subheader(f"Day {day} 的菜單")
+        if st.checkbox("鎖定這一天", value=day in plan.locked, key=f"lock_{day}"):
+            plan.lock(day)
+        else:
+            plan.unlock(day)
 
-        for day, menu in weekly_menu.items():
-            st.subheader(f"{day} 的菜單")
-            if not menu:
-                st.warning(f"{day} 的菜單未生成，請檢查菜品數據。")
-                continue
-            nutrition_table = build_nutrition_table_with_ingredients(menu)
-            st.dataframe(nutrition_table)
+        menu = plan.menu(day, group_counts, lunch_calories)
+        if not menu:
+            st.warning(f"Day {day} 的菜單未生成，請檢查菜品數據。")
+            continue
+        nutrition_table = build_nutrition_table_with_ingredients(menu)
+        st.dataframe(format_ingredient_columns(nutrition_table))
+
+        with st.expander("替換菜品"):
+            recipe_name = lambda recipe_id: engine.recipes[recipe_id]["name"]
+            old_id = st.selectbox("要替換的菜品", plan.recipe_ids(day), format_func=recipe_name, key=f"swap_old_{day}")
+            category_ids = engine.tags.ids(engine.tags.query([engine.recipes[old_id]["type"]],
+                                                             exclude=plan.excluded_tags))
+            candidates = [i for i in plan.available(category_ids, day).tolist() if i != old_id]
+            new_id = st.selectbox("替換為", candidates, format_func=recipe_name, key=f"swap_new_{day}")
+            if new_id is not None and st.button("替換", key=f"swap_{day}"):
+                plan.swap(day, old_id, new_id)
+                st.rerun()
+
+    st.subheader("整個計畫的食材總量")
+    plan_totals = plan.plan_ingredient_totals(group_counts, lunch_calories)
+    st.dataframe({"食材": list(plan_totals), "總量 (克)": list(plan_totals.values())})
+
+    # 下載整個計畫每天的表格；點擊時才逐日產生檔案
+    st.subheader("下載菜單")
+    total_people = sum(group_counts.values())
+    plan_menus = lambda: {f"Day {day}": plan.menu(day, group_counts, lunch_calories) for day in plan.days()}
+    for column, fmt in zip(st.columns(len(EXPORT_FORMATS)), available_formats()):
+        column.download_button(
+            f"下載 {fmt.upper()}",
+            data=lambda fmt=fmt: export_bytes(weekly_menu_tables(plan_menus(), None, total_people), fmt),
+            file_name=f"menu_plan.{fmt}",
+            mime=EXPORT_FORMATS[fmt],
+            on_click="ignore",
+        )
 
 if __name__ == "__main__":
     main()
@@ -1,135 +1,191 @@
 import streamlit as st
-import pandas as pd
-import json
-import random
-import matplotlib.pyplot as plt
+from menu_tables import build_nutrition_table_with_ingredients, format_ingredient_columns
+from data_cache import get_engine, cache_stats, get_data_version, get_menu_catalog, get_result_cache
+from recipe_usage import RecipeUsage
+from menu_planner import (
+    calculate_menu_for_day, day_rng, lunch_requirements, new_seed, scale_menus, validate_nutrition_ratio,
+)
+from menu_solver import solve_weekly_menus
+from candidate_search import best_random_weeks
+from result_cache import result_key
+from nutrition_charts import ratio_chart, validation_ratios, week_ratio_chart
+from menu_export import EXPORT_FORMATS, available_formats, export_bytes, weekly_menu_tables
+from ingredient_prices import menu_cost
+from portion_allocation import allocate_menu_portions
+from recipe_tags import DIET_EXCLUDES, excluded_tags
+from instrumentation import counters, increment, last_request, request, reset_stats, stage_stats, timed
 
-# 加載菜譜數據
-def load_recipes():
-    try:
-        with open("recipes.json", "r", encoding="utf-8") as file:
-            return json.load(file)
-    except Exception as e:
-        st.error(f"解析 recipes.json 時發生錯誤：{e}")
-        st.stop()
+NO_MENU_MESSAGES = {
+    "最佳化求解": "在時間上限內找不到營養比例全部符合要求的 5 天菜單，請調整人數或菜譜！",
+    "大量候選評估": "沒有可用的菜品，請檢查菜品數據。",
+    "最低成本": "在時間上限與預算內找不到營養比例全部符合要求的 5 天菜單，請調整預算、人數或菜譜！",
+}
 
-# 加載食材營養數據
-def load_nutrition_data():
+# 加載營養索引（菜譜或營養數據更新時自動重建）
+def load_nutrition_engine():
     try:
-        with open("ingredients_nutrition.json", "r", encoding="utf-8") as file:
-            return json.load(file)
+        return get_engine()
     except Exception as e:
-        st.error(f"解析 ingredients_nutrition.json 時發生錯誤：{e}")
+        st.error(f"載入 recipes.json 或 ingredients_nutrition.json 時發生錯誤：{e}")
         st.stop()
 
-# 計算菜品營養成分
-def calculate_recipe_nutrition(ingredients, nutrition_data):
-    total_nutrition = {"熱量": 0, "蛋白質": 0, "脂肪": 0, "碳水化合物": 0}
-    for ingredient, weight in ingredients.items():
-        if ingredient in nutrition_data:
-            nutrient = nutrition_data[ingredient]
-            total_nutrition["熱量"] += nutrient["calories"] * weight / 100
-            total_nutrition["蛋白質"] += nutrient["protein"] * weight / 100
-            total_nutrition["脂肪"] += nutrient["fat"] * weight / 100
-            total_nutrition["碳水化合物"] += nutrient["carbs"] * weight / 100
-    return {key: round(value, 1) for key, value in total_nutrition.items()}
-
-# 檢查每日營養比例
-def validate_nutrition_ratio(menu_summary, total_calories):
-    nutrition = {"蛋白質": 0, "脂肪": 0, "碳水化合物": 0}
-    for item in menu_summary:
-        nutrition["蛋白質"] += item["nutrition"]["蛋白質"]
-        nutrition["脂肪"] += item["nutrition"]["脂肪"]
-        nutrition["碳水化合物"] += item["nutrition"]["碳水化合物"]
-
-    protein_ratio = (nutrition["蛋白質"] * 4) / total_calories * 100
-    fat_ratio = (nutrition["脂肪"] * 9) / total_calories * 100
-    carb_ratio = (nutrition["碳水化合物"] * 4) / total_calories * 100
-
-    return {
-        "蛋白質": round(protein_ratio, 1),
-        "脂肪": round(fat_ratio, 1),
-        "碳水化合物": round(carb_ratio, 1),
-        "valid": 15 <= protein_ratio <= 25 and 20 <= fat_ratio <= 30 and 50 <= carb_ratio <= 60
-    }
-
-# 繪製營養比例圖表
+# 繪製營養比例圖表（相同比例直接使用快取的圖片）
 def plot_nutrition_ratio(validation):
-    labels = ["蛋白質", "脂肪", "碳水化合物"]
-    values = [validation["蛋白質"], validation["脂肪"], validation["碳水化合物"]]
-    plt.bar(labels, values, color=["#ff9999", "#66b3ff", "#99ff99"])
-    plt.axhline(y=15, color='red', linestyle='--', label='蛋白質最低')
-    plt.axhline(y=25, color='red', linestyle='--', label='蛋白質最高')
-    plt.axhline(y=20, color='blue', linestyle='--', label='脂肪最低')
-    plt.axhline(y=30, color='blue', linestyle='--', label='脂肪最高')
-    plt.axhline(y=50, color='green', linestyle='--', label='碳水最低')
-    plt.axhline(y=60, color='green', linestyle='--', label='碳水最高')
-    plt.ylabel("比例 (%)")
-    plt.title("每日營養成分比例")
-    plt.legend()
-    st.pyplot(plt)
-
-# 為某一天生成菜單
-def calculate_menu_for_day(recipes, group_counts, lunch_calories, nutrition_data, day, used_recipes):
-    total_people = sum(group_counts.values())
-    total_calories_needed = sum(count * lunch_calories[group] for group, count in group_counts.items())
-    category_ratios = {"主食": 0.3, "主菜": 0.4, "副菜": 0.2, "湯品": 0.1}
-    category_calories = {category: total_calories_needed * ratio for category, ratio in category_ratios.items()}
-
-    categorized_recipes = {category: [] for category in category_ratios.keys()}
-    for recipe in recipes:
-        if recipe["type"] in categorized_recipes and recipe not in used_recipes:
-            categorized_recipes[recipe["type"]].append(recipe)
-
-    menu_summary = []
-    for category in category_ratios:
-        available_recipes = categorized_recipes.get(category, [])
-        if not available_recipes:
-            continue
-
-        selected_recipe = random.choice(available_recipes)
-        recipe_nutrition = calculate_recipe_nutrition(selected_recipe["ingredients"], nutrition_data)
-        if recipe_nutrition["熱量"] == 0:
-            continue
-
-        portions = round(category_calories[category] / recipe_nutrition["熱量"], 1)
-        portions = min(portions, total_people)
-        total_ingredients = {ing: round(weight * portions, 1) for ing, weight in selected_recipe["ingredients"].items()}
-        total_nutrition = {key: round(value * portions, 1) for key, value in recipe_nutrition.items()}
-
-        menu_summary.append({
-            "name": selected_recipe["name"],
-            "type": selected_recipe["type"],
-            "calories": total_nutrition["熱量"],
-            "nutrition": total_nutrition,
-            "portions": portions,
-            "ingredients": total_ingredients
-        })
-
-        used_recipes.append(selected_recipe)
-
-    return menu_summary
-
-# 構建營養表
-def build_nutrition_table_with_ingredients(menu):
-    rows = []
-    for item in menu:
-        row = {
-            "菜品": item["name"],
-            "類型": item["type"],
-            "熱量 (kcal)": item["nutrition"]["熱量"],
-            "蛋白質 (g)": item["nutrition"]["蛋白質"],
-            "脂肪 (g)": item["脂肪"],
-            "碳水化合物 (g)": item["碳水化合物"]
-        }
-        rows.append(row)
-    return pd.DataFrame(rows)
+    st.image(ratio_chart(validation_ratios(validation)))
+
+# 整週營養比例合併為一張圖
+def plot_week_ratios(validations):
+    if validations:
+        st.image(week_ratio_chart(tuple(validation_ratios(validation) for validation in validations)))
+
+# 顯示單日菜單與營養比例檢查結果；daily_chart 為 True 時另畫當日圖表，回傳檢查結果供整週圖使用
+# allocation 為當日各族群份量（PortionAllocation），提供時另列各族群每人份量
+def show_daily_menu(day, daily_menu, total_calories_needed, daily_chart=False, allocation=None):
+    st.subheader(f"第 {day} 天的菜單")
+    with timed("nutrition"):
+        validation = validate_nutrition_ratio(daily_menu, total_calories_needed)
+    increment("days")
+    increment("menu_items", len(daily_menu))
+
+    if not validation["valid"]:
+        st.error(f"第 {day} 天的營養不符合要求（{'、'.join(validation['violations'])}），請調整菜單！")
+    else:
+        st.success(f"第 {day} 天的營養比例符合要求！")
+    if validation.get("limits"):
+        st.caption("每 1000 大卡含量：" + "、".join(f"{key} {value}" for key, value in validation["limits"].items()))
+
+    if daily_chart:
+        with timed("chart"):
+            plot_nutrition_ratio(validation)
+
+    if daily_menu:
+        with timed("table"):
+            nutrition_table = build_nutrition_table_with_ingredients(daily_menu)
+        with timed("render_table"):
+            st.dataframe(format_ingredient_columns(nutrition_table))
+    if allocation is not None and daily_menu:
+        with st.expander(f"第 {day} 天各族群每人份量"):
+            st.caption("各族群份量依當日菜單等比例分配，營養比例與上方檢查結果相同")
+            st.dataframe(allocation.rows())
+    return validation
+
+# 一週菜單各天的各族群份量
+def allocate_week(engine, week_menus, lunch_calories, group_counts):
+    with timed("portions"):
+        return [allocate_menu_portions(engine, menu, lunch_calories, group_counts) for menu in week_menus]
+
+# 顯示一週菜單，最後畫整週合併的營養比例圖
+def show_week(week_menus, total_calories_needed, daily_chart, allocations=None):
+    allocations = allocations or [None] * len(week_menus)
+    validations = [
+        show_daily_menu(day, daily_menu, total_calories_needed, daily_chart, allocation)
+        for day, (daily_menu, allocation) in enumerate(zip(week_menus, allocations), 1)
+    ]
+    if not daily_chart:
+        st.subheader("整週營養比例")
+        with timed("chart"):
+            plot_week_ratios(validations)
+
+# 下載整週菜單表格；點擊時才產生檔案，且不重新執行頁面（保留目前顯示的結果）
+def download_week(week_menus, total_people, key):
+    weekly_menu = {f"第 {day} 天": menu for day, menu in enumerate(week_menus, 1)}
+    for column, fmt in zip(st.columns(len(EXPORT_FORMATS)), available_formats()):
+        column.download_button(
+            f"下載 {fmt.upper()}",
+            data=lambda fmt=fmt: export_bytes(weekly_menu_tables(weekly_menu, None, total_people), fmt),
+            file_name=f"weekly_menu.{fmt}",
+            mime=EXPORT_FORMATS[fmt],
+            on_click="ignore",
+            key=f"{key}_{fmt}",
+        )
+
+# 選菜：回傳候選週菜單 [(標題, 每天的菜品編號清單)]；隨機選菜只有一組，標題為 None
+def select_weeks(engine, mode, settings, group_counts, lunch_calories, seed, excluded):
+    total_people, total_calories_needed = lunch_requirements(group_counts, lunch_calories)
+    if mode in ("最佳化求解", "最低成本"):
+        # 相同人數與設定的求解結果直接取自快取
+        objective = "cost" if mode == "最低成本" else "ratio"
+        key = result_key("solver-weeks", group_counts, None,
+                         {**settings, "objective": objective, "excluded": sorted(excluded)}, get_data_version())
+        weeks = get_result_cache().get_or_compute(key, lambda: solve_weekly_menus(
+            engine, total_calories_needed, total_people, top_k=settings["top_k"],
+            time_limit=settings["time_limit"], excluded_tags=excluded, objective=objective,
+            budget=settings.get("budget")))
+        if objective == "cost":
+            return [(f"候選菜單 {rank}（整週食材成本 {cost:,.0f} 元）", week)
+                    for rank, (cost, week) in enumerate(weeks, 1)]
+        return [(f"候選菜單 {rank}（偏離分數 {score:.2f}）", week) for rank, (score, week) in enumerate(weeks, 1)]
+    if mode == "大量候選評估":
+        key = result_key("candidate-weeks", group_counts, seed, {**settings, "excluded": sorted(excluded)},
+                         get_data_version())
+        weeks = get_result_cache().get_or_compute(key, lambda: best_random_weeks(
+            engine, total_calories_needed, total_people, candidates=settings["candidates"],
+            top_n=settings["top_k"], seed=seed, excluded_tags=excluded))
+        return [(f"候選菜單 {rank}（不合格 {invalid_days} 天，偏離分數 {score:.2f}）", week)
+                for rank, (invalid_days, score, _, week) in enumerate(weeks, 1)]
+    used_recipes = RecipeUsage(len(engine.recipes))
+    week_menus = [calculate_menu_for_day(group_counts, lunch_calories, engine, day, used_recipes,
+                                         rotate_protein=False, rng=day_rng(seed, day), excluded_tags=excluded)
+                  for day in range(1, 6)]
+    return [(None, [[engine.recipe_index[item["name"]] for item in menu] for menu in week_menus])]
+
+# 以目前人數計算的每天食材成本與每人每餐平均
+def show_week_cost(engine, week_menus, total_people):
+    with timed("cost"):
+        costs = [menu_cost(engine, menu) for menu in week_menus if menu]
+    if costs:
+        daily = "、".join(f"{cost:,.0f}" for cost in costs)
+        st.caption(f"食材成本：每天 {daily} 元，整週 {sum(costs):,.0f} 元，"
+                   f"每人每餐平均 {sum(costs) / (total_people * len(costs)):.1f} 元"
+                   f"（依 ingredient_prices.json 的單價計算，隨附的單價為估計值）")
+
+# 以目前人數顯示已選的週菜單：所有天的份量一次以陣列運算重新計算，不重新選菜
+def show_selection(engine, selection, group_counts, lunch_calories, daily_chart):
+    total_people, total_calories_needed = lunch_requirements(group_counts, lunch_calories)
+    if selection["seed"] is not None:
+        st.caption(f"種子：{selection['seed']}，數據版本：{engine.data_version}（輸入相同種子即可重現此菜單）")
+    if not selection["weeks"]:
+        st.error(NO_MENU_MESSAGES[selection["mode"]])
+    if total_calories_needed <= 0:
+        st.warning("請輸入用餐人數。")
+        return
+
+    catalog = get_menu_catalog(engine)
+    for rank, (label, week) in enumerate(selection["weeks"], 1):
+        with timed("rescale"):
+            week_menus = [catalog.to_dicts(items)
+                          for items in scale_menus(catalog, week, total_people, total_calories_needed)]
+        with st.container() if label is None else st.expander(label, expanded=rank == 1):
+            show_week_cost(engine, week_menus, total_people)
+            show_week(week_menus, total_calories_needed, daily_chart,
+                      allocate_week(engine, week_menus, lunch_calories, group_counts))
+            download_week(week_menus, total_people, f"download_{rank}")
+
+# 側邊欄效能除錯面板：各階段累計耗時、最近一次請求的分段耗時與 cProfile 結果
+def show_debug_panel(panel):
+    with panel:
+        stats = stage_stats()
+        if stats:
+            st.write("各階段累計（毫秒）")
+            st.table(stats)
+        totals = counters()
+        if totals:
+            st.write("累計計數：" + "、".join(f"{name} {value}" for name, value in totals.items()))
+        if (stats or totals) and st.button("清除累計統計", key="reset_stats"):
+            reset_stats()
+            st.rerun()
+        record = last_request()
+        if record is not None:
+            st.write(f"最近一次請求：{record['total_ms']:.1f} 毫秒")
+            st.json({"stages": record["stages"], "counters": record["counters"]})
+            if "profile" in record:
+                st.code(record["profile"])
 
 # 主應用
 def main():
     st.title("週菜單生成器 - 營養比例檢查")
-    recipes = load_recipes()
-    nutrition_data = load_nutrition_data()
+    with timed("load"):
+        engine = load_nutrition_engine()
 
     st.sidebar.header("輸入用餐人數")
     group_counts = {
@@ -141,6 +197,16 @@ def main():
         "成人_女": st.sidebar.number_input("成人（女）人數", min_value=0, value=4),
     }
 
+    with st.sidebar.expander("快取狀態"):
+        for name, stats in cache_stats().items():
+            st.write(f"{name}：命中 {stats['hits']} 次，未命中 {stats['misses']} 次")
+        result_stats = get_result_cache().stats
+        st.write(f"生成結果：記憶體命中 {result_stats['memory_hits']} 次，磁碟命中 {result_stats['disk_hits']} 次，"
+                 f"未命中 {result_stats['misses']} 次")
+
+    debug_panel = st.sidebar.expander("效能除錯")
+    profile = debug_panel.checkbox("以 cProfile 取樣", value=False)
+
     calories_per_day = {
         "幼兒_男": 1400, "幼兒_女": 1300,
         "國小_男": 1800, "國小_女": 1600,
@@ -149,25 +215,58 @@ def main():
     lunch_ratio = 0.4
     lunch_calories = {group: int(cal * lunch_ratio) for group, cal in calories_per_day.items()}
 
-    if st.button("生成 5 天菜單"):
-        used_recipes = []
-        for day in range(1, 6):
-            st.subheader(f"第 {day} 天的菜單")
-            daily_menu = calculate_menu_for_day(recipes, group_counts, lunch_calories, nutrition_data, day, used_recipes)
-            
-            total_calories_needed = sum(count * lunch_calories[group] for group, count in group_counts.items())
-            validation = validate_nutrition_ratio(daily_menu, total_calories_needed)
+    mode = st.sidebar.radio("選菜方式", ["隨機選菜", "最佳化求解", "大量候選評估", "最低成本"])
+    settings = {}
+    if mode != "隨機選菜":
+        settings["top_k"] = st.sidebar.number_input("候選週菜單數", min_value=1, max_value=10, value=1)
+    if mode in ("最佳化求解", "最低成本"):
+        settings["time_limit"] = st.sidebar.number_input("求解時間上限（秒）", min_value=0.5, value=2.0, step=0.5)
+    if mode == "最低成本":
+        settings["budget"] = st.sidebar.number_input("每人每餐預算（元，留空則不限）", min_value=1.0, value=None,
+                                                     step=5.0)
+        if engine.unpriced:
+            st.sidebar.warning(f"以下食材沒有價格，成本以 0 元計：{'、'.join(engine.unpriced)}")
+    diets = st.sidebar.multiselect("飲食限制", list(DIET_EXCLUDES))
+    exclude_tags = st.sidebar.multiselect("排除食材（過敏原等）", engine.tags.tags)
+    daily_chart = st.sidebar.radio("營養比例圖", ["整週合併", "每日各一張"]) == "每日各一張"
+    if mode == "大量候選評估":
+        settings["candidates"] = st.sidebar.number_input("評估候選數", min_value=1000, value=100000, step=10000)
+    seed_input = None
+    if mode in ("隨機選菜", "大量候選評估"):
+        seed_input = st.sidebar.number_input("隨機種子（留空則自動產生）", min_value=0, value=None, step=1)
 
-            if not validation["valid"]:
-                st.error(f"第 {day} 天的營養比例不符合要求，請調整菜單！")
-            else:
-                st.success(f"第 {day} 天的營養比例符合要求！")
+    # 影響選菜的輸入；人數不在其中：人數變動時沿用已選的菜品，只重新計算份量
+    inputs = {
+        "mode": mode,
+        "settings": settings,
+        "excluded": excluded_tags(exclude_tags, diets),
+        "seed": seed_input,
+        "data_version": engine.data_version,
+    }
+    selection = st.session_state.get("selection")
+    regenerate = st.button("生成 5 天菜單")
+    if regenerate or (selection is not None and selection["inputs"] != inputs):
+        # 隨機選菜與候選評估都以種子決定結果；設定變動而自動重選時沿用目前的種子
+        if mode in ("最佳化求解", "最低成本"):
+            seed = None
+        elif seed_input is not None:
+            seed = seed_input
+        elif not regenerate and selection["seed"] is not None:
+            seed = selection["seed"]
+        else:
+            seed = new_seed()
+        with request("generate_week", profile=profile or None, mode=mode, seed=seed):
+            with timed("select"):
+                weeks = select_weeks(engine, mode, settings, group_counts, lunch_calories, seed, inputs["excluded"])
+        selection = {"inputs": inputs, "mode": mode, "seed": seed, "weeks": weeks}
+        st.session_state["selection"] = selection
 
-            plot_nutrition_ratio(validation)
+    if selection is not None:
+        with request("render_week", profile=profile or None, mode=selection["mode"],
+                     total_people=sum(group_counts.values())):
+            show_selection(engine, selection, group_counts, lunch_calories, daily_chart)
 
-            if daily_menu:
-                nutrition_table = build_nutrition_table_with_ingredients(daily_menu)
-                st.dataframe(nutrition_table)
+    show_debug_panel(debug_panel)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,244 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from data_cache import get_data_version, get_engine, get_result_cache
+from ingredient_prices import weekly_menu_costs
+from menu_planner import (
+    CALORIES_PER_DAY, check_group_counts, default_lunch_calories, generate_weekly_menu, lunch_requirements, new_seed,
+    site_stream, weekly_plan_record,
+)
+from menu_export import open_table_writer, weekly_menu_tables
+from menu_solver import build_day_menu, solve_weekly_menus
+from portion_allocation import weekly_group_portions
+from recipe_tags import excluded_tags
+from procurement import ProcurementAggregator, procurement_vocabulary
+from result_cache import result_key
+
+# 批次產生多個場域的週菜單，不需要 streamlit、pandas 或 matplotlib（--export 匯出表格時需要 pandas）
+# 用法：python batch_menus.py sites.csv -o menus.jsonl --workers 8 [--export menus.xlsx]
+
+_worker_options = {}
+
+
+# 讀取場域清單：JSON（[{"site": ..., "group_counts": {...}}]）或 CSV（site 欄位加各族群人數欄位）
+# 場域可另外列出 "exclude_tags"（過敏原等食材標籤）與 "diets"（飲食限制，見 recipe_tags.DIET_EXCLUDES），
+# CSV 中以分號分隔多個值；"budget" 為每人每餐成本上限（元，最低成本模式使用，CSV 中留空時沿用 --budget）
+# 場域有誤（未知族群、人數不是非負整數或全為 0 等）時拋出 ValueError，並指出第幾個場域
+def load_sites(path):
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as file:
+            return check_sites(json.load(file))
+    sites = []
+    with open(path, "r", encoding="utf-8-sig", newline="") as file:
+        for row in csv.DictReader(file):
+            site = row.pop("site")
+            group_counts = {group: _csv_number(row.get(group), int) or 0 for group in CALORIES_PER_DAY}
+            entry = {
+                "site": site,
+                "group_counts": group_counts,
+                "exclude_tags": [tag for tag in (row.get("exclude_tags") or "").split(";") if tag],
+                "diets": [diet for diet in (row.get("diets") or "").split(";") if diet],
+            }
+            if (row.get("budget") or "").strip():
+                entry["budget"] = _csv_number(row["budget"], float)
+            sites.append(entry)
+    return check_sites(sites)
+
+
+# CSV 欄位轉為數值；空白為 None，無法轉換時保留原字串，交由 check_sites 回報
+def _csv_number(value, kind):
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return kind(value)
+    except ValueError:
+        return value
+
+
+# 在分派給工作程序之前檢查每個場域，人數規則同 API（見 menu_planner.check_group_counts）
+def check_sites(sites):
+    if not isinstance(sites, list):
+        raise ValueError("場域清單必須是陣列")
+    for index, site in enumerate(sites, 1):
+        name = site.get("site") if isinstance(site, dict) else None
+        try:
+            if not isinstance(site, dict):
+                raise ValueError("必須是物件")
+            if name is None:
+                raise ValueError("缺少 site 名稱")
+            site["group_counts"] = check_group_counts(site.get("group_counts"))
+            excluded_tags(site.get("exclude_tags", ()), site.get("diets", ()))
+            budget = site.get("budget")
+            if budget is not None and (not isinstance(budget, (int, float)) or isinstance(budget, bool) or budget <= 0):
+                raise ValueError("budget 必須是正數")
+        except ValueError as error:
+            label = f"第 {index} 個場域" + (f"（{name}）" if name is not None else "")
+            raise ValueError(f"{label}：{error}") from error
+    return sites
+
+
+# 週菜單的食材總量（克）
+def weekly_ingredient_totals(weekly_menu):
+    totals = {}
+    for menu in weekly_menu.values():
+        for item in menu:
+            for ingredient, amount in item["ingredients"].items():
+                totals[ingredient] = totals.get(ingredient, 0) + amount
+    return {ingredient: round(amount, 1) for ingredient, amount in totals.items()}
+
+
+# 以最佳化求解產生週菜單；objective 為 "cost" 時求營養比例合格下成本最低的菜單，找不到可行解時回傳空字典
+def solve_weekly_menu(engine, group_counts, lunch_calories, excluded=(), objective="ratio", budget=None):
+    total_people, total_calories_needed = lunch_requirements(group_counts, lunch_calories)
+    weeks = solve_weekly_menus(engine, total_calories_needed, total_people, excluded_tags=excluded,
+                               objective=objective, budget=budget)
+    weekly_menu = {}
+    if weeks:
+        for day, recipe_ids in enumerate(weeks[0][1], 1):
+            weekly_menu[f"Day {day}"] = build_day_menu(engine, recipe_ids, total_calories_needed, total_people)
+    return weekly_menu
+
+
+# 週菜單結果的快取鍵；隨機選菜以 (種子, 場域串流) 決定結果，求解則與種子無關
+def weekly_menu_cache_key(group_counts, lunch_calories, mode, seed=None, stream=(), recipes_path="recipes.json",
+                          nutrition_path="ingredients_nutrition.json", excluded=(), budget=None):
+    settings = {"mode": mode, "lunch_calories": lunch_calories, "stream": list(stream), "excluded": sorted(excluded),
+                "budget": budget}
+    return result_key("weekly-menu", group_counts, seed if mode == "random" else None, settings,
+                      get_data_version(recipes_path, nutrition_path))
+
+
+# 為單一場域產生週菜單；相同人數、種子與數據版本的結果取自快取
+# 隨機選菜使用 (種子, 場域名稱) 決定的亂數串流，單獨重跑某個場域也會得到相同結果；
+# 場域可在清單中以 "seed" 指定自己的種子，未指定種子時產生新的種子並記錄在結果中；
+# 結果中的 "plan_record" 可在 app135 載入為可編輯的計畫
+# mode 為 "cost" 時求解成本最低的菜單，場域有設定 "budget" 時優先於 budget 參數
+def plan_site(site, mode="random", recipes_path="recipes.json", nutrition_path="ingredients_nutrition.json",
+              seed=None, budget=None):
+    engine = get_engine(recipes_path, nutrition_path)
+    group_counts = site["group_counts"]
+    lunch_calories = default_lunch_calories()
+    seed = site.get("seed", seed)
+    excluded = excluded_tags(site.get("exclude_tags", ()), site.get("diets", ()))
+
+    if site.get("budget") is not None:
+        budget = site["budget"]
+    budget = budget if mode == "cost" else None
+
+    if mode in ("solver", "cost"):
+        seed = None
+        objective = "cost" if mode == "cost" else "ratio"
+        key = weekly_menu_cache_key(group_counts, lunch_calories, mode, recipes_path=recipes_path,
+                                    nutrition_path=nutrition_path, excluded=excluded, budget=budget)
+        weekly_menu = get_result_cache().get_or_compute(
+            key, lambda: solve_weekly_menu(engine, group_counts, lunch_calories, excluded, objective, budget)
+        )
+    elif seed is None:
+        seed = new_seed()
+        weekly_menu = generate_weekly_menu(group_counts, lunch_calories, engine, seed=seed,
+                                           stream=(site_stream(site["site"]),), excluded_tags=excluded)
+    else:
+        stream = (site_stream(site["site"]),)
+        key = weekly_menu_cache_key(group_counts, lunch_calories, mode, seed, stream, recipes_path, nutrition_path,
+                                    excluded)
+        weekly_menu = get_result_cache().get_or_compute(
+            key, lambda: generate_weekly_menu(group_counts, lunch_calories, engine, seed=seed, stream=stream,
+                                              excluded_tags=excluded)
+        )
+
+    return {
+        "site": site["site"],
+        "group_counts": group_counts,
+        "seed": seed,
+        "excluded_tags": excluded,
+        "data_version": engine.data_version,
+        "weekly_menu": weekly_menu,
+        "ingredient_totals": weekly_ingredient_totals(weekly_menu),
+        "group_portions": weekly_group_portions(engine, weekly_menu, lunch_calories, group_counts),
+        "cost": weekly_menu_costs(engine, weekly_menu, sum(group_counts.values())),
+        "plan_record": weekly_plan_record(engine, weekly_menu, seed, excluded),
+    }
+
+
+def _init_worker(options):
+    _worker_options.update(options)
+
+
+def _plan_site_in_worker(site):
+    return plan_site(site, **_worker_options)
+
+
+# 依輸入順序逐一產出各場域結果；workers > 1 時以多個程序平行處理
+def plan_sites(sites, workers=None, **options):
+    if workers == 1:
+        for site in sites:
+            yield plan_site(site, **options)
+        return
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             initializer=_init_worker, initargs=(options,)) as pool:
+        yield from pool.map(_plan_site_in_worker, sites, chunksize=4)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批次產生多個場域的週菜單與食材總量（JSON Lines）")
+    parser.add_argument("sites", help="場域清單（.json 或 .csv）")
+    parser.add_argument("-o", "--output", help="輸出檔，預設為標準輸出")
+    parser.add_argument("--mode", choices=["random", "solver", "cost"], default="random",
+                        help="選菜方式（cost 為營養比例合格下食材成本最低）")
+    parser.add_argument("--budget", type=float, default=None, help="cost 模式的每人每餐成本上限（元）")
+    parser.add_argument("--workers", type=int, default=None, help="工作程序數，預設為 CPU 核心數")
+    parser.add_argument("--procurement", help="另外輸出採購彙總（.csv 或 .parquet，單位公斤）")
+    parser.add_argument("--export", help="另外匯出各場域每天的營養與食材表格（.xlsx、.csv 或 .parquet）")
+    parser.add_argument("--delivery-days", help="每個菜單天對應的到貨日，以逗號分隔，例如 1,1,3,3,3")
+    parser.add_argument("--seed", type=int, default=None, help="隨機種子；未指定時產生新的種子並記錄在每筆結果中")
+    parser.add_argument("--cache-dir", help="求解結果的磁碟快取目錄（可跨次執行重複使用）")
+    parser.add_argument("--recipes", default="recipes.json")
+    parser.add_argument("--nutrition", default="ingredients_nutrition.json")
+    args = parser.parse_args(argv)
+    if args.cache_dir:
+        os.environ["LUNCH_RESULT_CACHE_DIR"] = args.cache_dir  # 工作程序繼承此設定
+
+    try:
+        sites = load_sites(args.sites)
+    except ValueError as error:
+        parser.error(str(error))
+    aggregator = None
+    if args.procurement:
+        aggregator = ProcurementAggregator(procurement_vocabulary(get_engine(args.recipes, args.nutrition)))
+    # 表格隨各場域結果逐一寫出，不需先收集所有場域
+    exporter = open_table_writer(args.export) if args.export else None
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        seed = args.seed if args.seed is not None else new_seed()
+        results = plan_sites(sites, workers=args.workers, mode=args.mode, seed=seed, budget=args.budget,
+                             recipes_path=args.recipes, nutrition_path=args.nutrition)
+        for result in results:
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            if aggregator is not None:
+                if result["weekly_menu"]:
+                    aggregator.add_site(result["site"], result["weekly_menu"])
+                else:
+                    print(f"{result['site']} 沒有產生菜單，未列入採購彙總", file=sys.stderr)
+            if exporter is not None:
+                total_people = sum(result["group_counts"].values())
+                for site, day, table in weekly_menu_tables(result["weekly_menu"], result["site"], total_people):
+                    exporter.add(site, day, table)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if exporter is not None:
+            exporter.close()
+
+    if aggregator is not None:
+        delivery_days = [int(day) for day in args.delivery_days.split(",")] if args.delivery_days else None
+        aggregator.export(args.procurement, delivery_days)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from menu_planner import CALORIES_PER_DAY, calculate_menu_for_day, day_rng, default_lunch_calories, generate_weekly_menu
+from menu_solver import CATEGORY_RATIOS
+from nutrient_schema import NUTRIENTS
+from nutrition_engine import NUTRIENT_FIELDS
+from nutrition_index import load_engine
+from recipe_usage import RecipeUsage
+
+# 以合成的大型菜譜與營養表測量選菜流程：吞吐量、延遲百分位數與記憶體峰值，結果存成 JSON 以便比較版本
+# 用法：python benchmark_menus.py --sizes 1000 10000 100000 -o benchmark_results.json [--compare 舊結果.json]
+#       [--wide-nutrients]（營養表另外合成 nutrient_schema.NUTRIENTS 中所有營養素）
+#       python benchmark_menus.py --sizes --imports  （只測量模組載入時間）
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+IMPORT_MODULES = [
+    "nutrition_engine", "menu_planner", "menu_solver", "candidate_search", "batch_menus",
+    "menu_tables", "nutrition_charts", "app135yy", "app135",
+]
+HEAVY_MODULES = ["pandas", "matplotlib", "streamlit", "pyarrow"]
+GROUP_COUNTS = {group: 30 for group in CALORIES_PER_DAY}
+
+
+# 產生合成數據：食材營養值取自真實營養表再加上擾動，菜品類型比例與真實菜譜相同
+# wide_nutrients 為 True 時另外為每種食材合成其他營養素（隨機數值，只用於測量寬營養向量的成本）
+def generate_synthetic_data(recipe_count, seed=0, nutrition_path="ingredients_nutrition.json",
+                            recipes_path="recipes.json", wide_nutrients=False):
+    rng = np.random.default_rng(seed)
+    with open(nutrition_path, "r", encoding="utf-8") as file:
+        base_nutrition = json.load(file)
+    with open(recipes_path, "r", encoding="utf-8") as file:
+        base_recipes = json.load(file)
+
+    base_names = list(base_nutrition)
+    base_values = np.array([[base_nutrition[name][field] for field in NUTRIENT_FIELDS] for name in base_names])
+    ingredient_count = max(len(base_names), recipe_count // 10)
+    source = rng.integers(len(base_names), size=ingredient_count)
+    values = base_values[source] * rng.uniform(0.8, 1.2, size=(ingredient_count, len(NUTRIENT_FIELDS)))
+    names = [f"{base_names[s]}#{i}" for i, s in enumerate(source.tolist())]
+    nutrition_data = {
+        name: dict(zip(NUTRIENT_FIELDS, np.round(row, 4).tolist())) for name, row in zip(names, values)
+    }
+
+    types = [recipe["type"] for recipe in base_recipes]
+    recipe_types = rng.choice(types, size=recipe_count)
+    ingredient_counts = rng.integers(2, 7, size=recipe_count)
+    recipes = []
+    for i, (category, count) in enumerate(zip(recipe_types.tolist(), ingredient_counts.tolist())):
+        chosen = rng.choice(ingredient_count, size=count, replace=False)
+        weights = rng.integers(5, 121, size=count)
+        recipes.append({
+            "name": f"{category}{i}",
+            "type": category,
+            "ingredients": {names[j]: int(w) for j, w in zip(chosen.tolist(), weights.tolist())},
+        })
+
+    if wide_nutrients:
+        extra_fields = [field for field in NUTRIENTS if field not in NUTRIENT_FIELDS]
+        extra_values = np.round(rng.gamma(1.0, 20.0, size=(ingredient_count, len(extra_fields))), 4)
+        for name, row in zip(names, extra_values.tolist()):
+            nutrition_data[name].update(zip(extra_fields, row))
+    return recipes, nutrition_data
+
+
+# 將合成數據寫入目錄，回傳 (recipes.json 路徑, ingredients_nutrition.json 路徑)
+def write_synthetic_data(directory, recipe_count, seed=0, wide_nutrients=False):
+    recipes, nutrition_data = generate_synthetic_data(recipe_count, seed, wide_nutrients=wide_nutrients)
+    recipes_path = os.path.join(directory, "recipes.json")
+    nutrition_path = os.path.join(directory, "ingredients_nutrition.json")
+    with open(recipes_path, "w", encoding="utf-8") as file:
+        json.dump(recipes, file, ensure_ascii=False)
+    with open(nutrition_path, "w", encoding="utf-8") as file:
+        json.dump(nutrition_data, file, ensure_ascii=False)
+    return recipes_path, nutrition_path
+
+
+# 重複執行 run(i) 並統計；另外在 tracemalloc 下多跑一次以取得記憶體峰值
+def measure(run, iterations):
+    latencies = np.empty(iterations)
+    started = time.perf_counter()
+    for i in range(iterations):
+        start = time.perf_counter()
+        run(i)
+        latencies[i] = time.perf_counter() - start
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        run(iterations)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+    return {
+        "iterations": iterations,
+        "total_s": round(elapsed, 4),
+        "throughput_per_s": round(iterations / elapsed, 2) if elapsed > 0 else None,
+        "latency_ms": {
+            "mean": round(float(latencies.mean()) * 1000, 4),
+            "p50": round(float(p50), 4),
+            "p90": round(float(p90), 4),
+            "p99": round(float(p99), 4),
+            "max": round(float(latencies.max()) * 1000, 4),
+        },
+        "peak_memory_mb": round(peak / 2 ** 20, 3),
+    }
+
+
+# 單一資料規模的各階段測量
+def benchmark_size(recipe_count, iterations=200, load_iterations=3, seed=0, wide_nutrients=False):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        recipes_path, nutrition_path = write_synthetic_data(directory, recipe_count, seed, wide_nutrients)
+        index_path = os.path.join(directory, "nutrition_index.bin")
+
+        # 冷啟動：每次都重新驗證數據並建立索引；熱啟動：直接映射既有索引
+        def load_cold(_):
+            if os.path.exists(index_path):
+                os.remove(index_path)
+            load_engine(recipes_path, nutrition_path, index_path)
+
+        results["load_cold"] = measure(load_cold, load_iterations)
+        results["load_warm"] = measure(lambda _: load_engine(recipes_path, nutrition_path, index_path),
+                                       load_iterations)
+        engine = load_engine(recipes_path, nutrition_path, index_path)
+
+        lunch_calories = default_lunch_calories()
+        recipe_ids = np.random.default_rng(seed).integers(len(engine.recipes), size=iterations + 1)
+        results["recipe_nutrition"] = measure(
+            lambda i: engine.recipe_nutrition(engine.recipes[recipe_ids[i]]), iterations
+        )
+        results["day"] = measure(
+            lambda i: calculate_menu_for_day(GROUP_COUNTS, lunch_calories, engine, 1,
+                                             RecipeUsage(len(engine.recipes)), rng=day_rng(seed, i)),
+            iterations,
+        )
+        results["week"] = measure(lambda i: generate_weekly_menu(GROUP_COUNTS, lunch_calories, engine, seed=seed + i),
+                                  iterations)
+        nutrient_count = len(engine.nutrient_keys)
+
+        # 表格建立需要 pandas；未安裝時略過此階段
+        if importlib.util.find_spec("pandas") is None:
+            print("未安裝 pandas，略過表格建立測量", file=sys.stderr)
+        else:
+            from menu_tables import build_nutrition_table_with_ingredients
+
+            week = generate_weekly_menu(GROUP_COUNTS, lunch_calories, engine, seed=seed)
+            menus = list(week.values())
+            total_people = sum(GROUP_COUNTS.values())
+            # 第一次建立表格時才載入 pandas，先建立一次，載入時間另以 --imports 測量
+            build_nutrition_table_with_ingredients(menus[0], total_people)
+            results["table"] = measure(
+                lambda i: build_nutrition_table_with_ingredients(menus[i % len(menus)], total_people), iterations
+            )
+    return {"recipes": recipe_count, "categories": list(CATEGORY_RATIOS), "nutrients": nutrient_count,
+            "stages": results}
+
+
+# 在新的直譯器中測量模組載入時間（扣除空白直譯器的啟動時間，取中位數），並列出被連帶載入的重量級套件
+def import_times(modules=IMPORT_MODULES, repeats=5):
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    def run(code):
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            completed = subprocess.run([sys.executable, "-c", code], cwd=directory,
+                                       capture_output=True, text=True, check=True)
+            samples.append(time.perf_counter() - start)
+        return float(np.median(samples)), completed.stdout.strip()
+
+    baseline, _ = run("pass")
+    results = {}
+    for module in modules:
+        code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        try:
+            elapsed, loaded = run(code)
+        except subprocess.CalledProcessError:
+            print(f"無法載入 {module}，略過", file=sys.stderr)
+            continue
+        results[module] = {"ms": round((elapsed - baseline) * 1000, 1), "heavy": [m for m in loaded.split(",") if m]}
+    return results
+
+
+# 執行環境與版本資訊，方便比較不同版本的結果
+def environment_info():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+    }
+
+
+# 與先前的結果比較各階段 p50 延遲（比值 > 1 表示變慢）；只比較菜品數與營養素數都相同的結果
+def compare_results(current, baseline):
+    previous = {(entry["recipes"], entry.get("nutrients", len(NUTRIENT_FIELDS)), stage): stats
+                for entry in baseline["results"] for stage, stats in entry["stages"].items()}
+    lines = []
+    for entry in current["results"]:
+        for stage, stats in entry["stages"].items():
+            old = previous.get((entry["recipes"], entry["nutrients"], stage))
+            if old is None or old["latency_ms"]["p50"] == 0:
+                continue
+            ratio = stats["latency_ms"]["p50"] / old["latency_ms"]["p50"]
+            lines.append(f"{entry['recipes']:>7} {stage:<17} p50 {old['latency_ms']['p50']:>10.3f} → "
+                         f"{stats['latency_ms']['p50']:>10.3f} ms  ×{ratio:.2f}")
+    for module, stats in current.get("imports", {}).items():
+        old = baseline.get("imports", {}).get(module)
+        if old is not None:
+            lines.append(f"import {module:<17} {old['ms']:>8.1f} → {stats['ms']:>8.1f} ms")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以合成數據測量選菜流程的效能")
+    parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES, help="菜品數量；不給值則略過流程測量")
+    parser.add_argument("--iterations", type=int, default=200, help="每個階段的重複次數")
+    parser.add_argument("--load-iterations", type=int, default=3, help="載入階段的重複次數")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--imports", action="store_true", help="另外測量各模組的載入時間")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="結果輸出檔")
+    parser.add_argument("--compare", help="與先前的結果檔比較")
+    parser.add_argument("--wide-nutrients", action="store_true", help="合成數據另外包含所有已知營養素")
+    args = parser.parse_args(argv)
+
+    report = {"environment": environment_info(), "results": []}
+    for size in args.sizes:
+        entry = benchmark_size(size, args.iterations, args.load_iterations, args.seed, args.wide_nutrients)
+        report["results"].append(entry)
+        for stage, stats in entry["stages"].items():
+            latency = stats["latency_ms"]
+            print(f"{size:>7} {stage:<17} {stats['throughput_per_s']:>10} 次/秒  "
+                  f"p50 {latency['p50']:.3f} ms  p99 {latency['p99']:.3f} ms  "
+                  f"峰值 {stats['peak_memory_mb']:.2f} MB")
+
+    if args.imports:
+        report["imports"] = import_times()
+        for module, stats in report["imports"].items():
+            print(f"import {module:<17} {stats['ms']:>8.1f} ms  {'、'.join(stats['heavy']) or '—'}")
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        for line in compare_results(report, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from menu_planner import DAYS_PER_WEEK
+from menu_solver import (
+    CATEGORY_RATIOS, OBJECTIVES, PROTEIN_ROTATION, constraint_bands, dish_costs, main_dish_protein,
+    ratio_contributions, ratio_score, recipe_portions,
+)
+
+# 每個工作區塊評估的候選週菜單數；區塊數固定，結果不受工作程序數量影響
+CHUNK_SIZE = 20000
+
+# 工作程序中共用的候選抽樣資料（由 _init_worker 設定）
+_worker_state = {}
+
+
+# 候選抽樣資料：每類可用菜品、主菜肉品輪替，以及每道菜對營養比例（與營養素上下限）的貢獻與食材成本
+# excluded_tags 中任一標籤（過敏原、飲食限制）的菜品不列入抽樣
+def candidate_pools(engine, total_calories, total_people, days=DAYS_PER_WEEK,
+                    category_ratios=CATEGORY_RATIOS, rotation=PROTEIN_ROTATION, excluded_tags=()):
+    portions = recipe_portions(engine, total_calories, total_people, category_ratios)
+    contributions = ratio_contributions(engine, portions, total_calories)
+    categories = list(category_ratios)
+    tags = engine.tags
+    allowed = tags.query(exclude=excluded_tags, within=tags.from_ids(np.flatnonzero(portions > 0)))
+    pools = [tags.ids(tags.query([category], within=allowed)) for category in categories]
+
+    # 每天主菜的肉品；肉品菜色不足以整週不重複時不套用輪替
+    day_meats = None
+    if "主菜" in categories and rotation:
+        protein = main_dish_protein(engine, rotation)
+        day_meats = [rotation[day % len(rotation)] for day in range(days)]
+        main_pool = pools[categories.index("主菜")]
+        for meat in dict.fromkeys(day_meats):
+            if sum(protein.get(int(i)) == meat for i in main_pool) < day_meats.count(meat):
+                day_meats = None
+                break
+        if day_meats is not None:
+            meat_pools = {
+                meat: np.array([i for i in main_pool if protein.get(int(i)) == meat], dtype=np.int64)
+                for meat in dict.fromkeys(day_meats)
+            }
+            day_meats = [(meat_pools[meat], [d for d, m in enumerate(day_meats) if m == meat]) for meat in meat_pools]
+
+    return {
+        "days": days,
+        "pools": pools,
+        "main_column": categories.index("主菜") if "主菜" in categories else None,
+        "day_meats": day_meats,
+        "contributions": contributions,
+        "bands": constraint_bands(engine),
+        "costs": dish_costs(engine, portions),
+    }
+
+
+# 從 pool 中為每個候選抽出 count 道不重複的菜（菜色不足時才循環重複）
+def _draw(rng, pool, batch_size, count):
+    if len(pool) < count * 4:
+        order = rng.random((batch_size, len(pool))).argsort(axis=1)
+        return pool[order[:, np.arange(count) % len(pool)]]
+    # 菜色遠多於天數時直接抽樣，只重抽有重複的候選
+    picks = rng.integers(len(pool), size=(batch_size, count))
+    while True:
+        sorted_picks = np.sort(picks, axis=1)
+        repeated = (sorted_picks[:, 1:] == sorted_picks[:, :-1]).any(axis=1)
+        if not repeated.any():
+            return pool[picks]
+        picks[repeated] = rng.integers(len(pool), size=(int(repeated.sum()), count))
+
+
+# 隨機抽樣一批週菜單，形狀為 (候選數, 天數, 類型數)
+def sample_weeks(rng, state, batch_size):
+    days = state["days"]
+    weeks = np.empty((batch_size, days, len(state["pools"])), dtype=np.int64)
+    for column, pool in enumerate(state["pools"]):
+        if column == state["main_column"] and state["day_meats"] is not None:
+            for meat_pool, meat_days in state["day_meats"]:
+                weeks[:, meat_days, column] = _draw(rng, meat_pool, batch_size, len(meat_days))
+        else:
+            weeks[:, :, column] = _draw(rng, pool, batch_size, days)
+    return weeks
+
+
+# 以營養比例與上下限檢查評分：回傳不合格天數、與範圍中心的距離，以及整週食材成本（與營養比例同樣以索引加總）
+def score_weeks(contributions, costs, weeks, bands):
+    ratios = contributions[weeks].sum(axis=2)
+    valid = np.all((ratios >= bands[:, 0]) & (ratios <= bands[:, 1]), axis=2)
+    invalid_days = (~valid).sum(axis=1)
+    return invalid_days, ratio_score(ratios).sum(axis=1), costs[weeks].sum(axis=(1, 2))
+
+
+# 取出前 top_n 名：先比不合格天數，再比偏離分數（objective 為 "cost" 時先比成本），回傳各項陣列
+def _best(invalid_days, scores, costs, weeks, top_n, objective):
+    keys = (scores, invalid_days) if objective == "ratio" else (scores, costs, invalid_days)
+    order = np.lexsort(keys)[:top_n]
+    return invalid_days[order], scores[order], costs[order], weeks[order]
+
+
+def _init_worker(state):
+    _worker_state.update(state)
+
+
+# 評估一個區塊：以該區塊專屬的種子抽樣並保留區塊內前 top_n 名
+def _evaluate_chunk(seed_sequence, batch_size, top_n, objective):
+    rng = np.random.default_rng(seed_sequence)
+    weeks = sample_weeks(rng, _worker_state, batch_size)
+    invalid_days, scores, costs = score_weeks(_worker_state["contributions"], _worker_state["costs"], weeks,
+                                              _worker_state["bands"])
+    return _best(invalid_days, scores, costs, weeks, top_n, objective)
+
+
+# 平行抽樣大量隨機週菜單並保留最佳 top_n 組，回傳 [(不合格天數, 偏離分數, 整週成本, 每日菜品編號)]
+# objective 為 "cost" 時在不合格天數相同的候選中優先選成本最低者
+def best_random_weeks(engine, total_calories, total_people, candidates=100000, top_n=5, seed=0,
+                      workers=None, days=DAYS_PER_WEEK, chunk_size=CHUNK_SIZE, excluded_tags=(), objective="ratio"):
+    if objective not in OBJECTIVES:
+        raise ValueError(f"未知的評估目標：{objective}（可用 {'、'.join(OBJECTIVES)}）")
+    state = candidate_pools(engine, total_calories, total_people, days, excluded_tags=excluded_tags)
+    if total_calories <= 0 or any(len(pool) == 0 for pool in state["pools"]):
+        return []
+
+    chunk_sizes = [chunk_size] * (candidates // chunk_size)
+    if candidates % chunk_size:
+        chunk_sizes.append(candidates % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+
+    if workers == 1 or len(chunk_sizes) == 1:
+        _init_worker(state)
+        results = [_evaluate_chunk(s, size, top_n, objective) for s, size in zip(seeds, chunk_sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                 initializer=_init_worker, initargs=(state,)) as pool:
+            results = list(pool.map(_evaluate_chunk, seeds, chunk_sizes, [top_n] * len(chunk_sizes),
+                                    [objective] * len(chunk_sizes)))
+
+    # 合併各區塊結果；同分時依區塊順序，與工作程序數量無關
+    invalid_days, scores, costs, weeks = (np.concatenate([r[i] for r in results]) for i in range(4))
+    invalid_days, scores, costs, weeks = _best(invalid_days, scores, costs, weeks, top_n, objective)
+    return [(int(bad), float(score), float(cost), week.tolist())
+            for bad, score, cost, week in zip(invalid_days, scores, costs, weeks)]
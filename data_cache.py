@@ -0,0 +1,94 @@
+import os
+import threading
+
+from ingredient_prices import default_prices_path
+from menu_types import MenuCatalog
+from nutrition_index import data_version, default_aliases_path, load_engine
+from recipe_tags import default_taxonomy_path
+from result_cache import ResultCache
+
+# 程序層級快取：每個名稱保留最新的一筆 (鍵, 值)，資料檔變更時鍵隨之改變
+_cache = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+# 以檔案大小與修改時間作為快取鍵；不存在的檔案以 None 表示
+def file_key(*paths):
+    key = []
+    for path in paths:
+        if not os.path.exists(path):
+            key.append((os.path.abspath(path), None, None))
+            continue
+        stat = os.stat(path)
+        key.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+    return tuple(key)
+
+
+# 取得快取值；鍵不同時重新建立並記錄命中／未命中次數
+def cached(name, key, build):
+    with _lock:
+        stats = _stats.setdefault(name, {"hits": 0, "misses": 0})
+        entry = _cache.get(name)
+        if entry is not None and entry[0] == key:
+            stats["hits"] += 1
+            return entry[1]
+        stats["misses"] += 1
+    value = build()
+    with _lock:
+        _cache[name] = (key, value)
+    return value
+
+
+# 快取命中統計
+def cache_stats():
+    with _lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
+
+
+# 清除快取與統計
+def clear_cache():
+    with _lock:
+        _cache.clear()
+        _stats.clear()
+
+
+# 營養計算引擎（含每道菜營養、成本、類型與標籤索引）；食材別名檔、分類檔或價格表變更時同樣重新載入
+def get_engine(recipes_path="recipes.json", nutrition_path="ingredients_nutrition.json"):
+    aliases_path = default_aliases_path(recipes_path)
+    taxonomy_path = default_taxonomy_path(recipes_path)
+    prices_path = default_prices_path(recipes_path)
+    key = file_key(recipes_path, nutrition_path, aliases_path, taxonomy_path, prices_path)
+    return cached("engine", key, lambda: load_engine(recipes_path, nutrition_path, aliases_path=aliases_path,
+                                                     taxonomy_path=taxonomy_path, prices_path=prices_path))
+
+
+# 數據版本：菜譜、營養表、別名檔、分類檔與價格表內容的雜湊（與 engine.data_version 相同），檔案未變動時不重新計算
+def get_data_version(recipes_path="recipes.json", nutrition_path="ingredients_nutrition.json"):
+    paths = (recipes_path, nutrition_path, default_aliases_path(recipes_path), default_taxonomy_path(recipes_path),
+             default_prices_path(recipes_path))
+    return cached("data_version", file_key(*paths), lambda: data_version(*paths))
+
+
+# 程序層級的生成結果快取；設定 LUNCH_RESULT_CACHE_DIR 時另外存放在該目錄，供多個程序共用
+def get_result_cache():
+    directory = os.environ.get("LUNCH_RESULT_CACHE_DIR")
+    return cached("result_cache", directory, lambda: ResultCache(directory))
+
+
+# 按類型分類的菜品清單
+def get_categorized_recipes(engine, categories):
+    categories = tuple(categories)
+    return cached(
+        "categorized_recipes",
+        (engine, categories),
+        lambda: {
+            category: [engine.recipes[i] for i in engine.category_index.get(category, [])]
+            for category in categories
+        },
+    )
+
+
+# 由引擎建立的型別化菜品目錄（見 menu_types.py）
+def get_menu_catalog(engine):
+    return cached("menu_catalog", engine, lambda: MenuCatalog(engine))
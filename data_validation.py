@@ -0,0 +1,90 @@
+import difflib
+import json
+import sys
+
+from menu_solver import CATEGORY_RATIOS
+from nutrient_schema import nutrient_fields
+
+
+# 菜譜或營養數據有問題時拋出，problems 為逐項說明
+class DataValidationError(ValueError):
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__("菜譜或營養數據有誤：\n" + "\n".join(f"- {problem}" for problem in problems))
+
+
+# 找出營養表中名稱相近的食材：字元重疊優先，再參考 difflib 相似度
+def suggest_ingredients(name, catalog, limit=3):
+    characters = set(name)
+    scored = []
+    for candidate in catalog:
+        overlap = len(characters & set(candidate)) / len(characters | set(candidate))
+        ratio = difflib.SequenceMatcher(None, name, candidate).ratio()
+        if overlap > 0 or ratio > 0:
+            scored.append((overlap + ratio, candidate))
+    scored.sort(key=lambda item: -item[0])
+    return [candidate for _, candidate in scored[:limit]]
+
+
+# 檢查菜譜與營養數據，回傳問題清單（空清單表示沒有問題）
+def validate_data(recipes, nutrition_data, aliases=None):
+    aliases = {alias: target for alias, target in (aliases or {}).items() if not alias.startswith("_")}
+    problems = []
+
+    # 核心四項每種食材都必須提供；其他營養素只要有食材提供，其餘食材也必須提供，以免加總時少算
+    fields = nutrient_fields(nutrition_data)
+    for ingredient, nutrient in nutrition_data.items():
+        missing = [field for field in fields if not isinstance(nutrient.get(field), (int, float))]
+        if missing:
+            problems.append(f"營養表中「{ingredient}」缺少數值欄位：{', '.join(missing)}")
+
+    for alias, target in aliases.items():
+        if target not in nutrition_data:
+            problems.append(f"別名「{alias}」對應的「{target}」不在營養表中")
+
+    unresolved = {}
+    seen_names = set()
+    for recipe in recipes:
+        name = recipe.get("name")
+        if name in seen_names:
+            problems.append(f"菜名「{name}」重複")
+        seen_names.add(name)
+        if recipe.get("type") not in CATEGORY_RATIOS:
+            problems.append(f"「{name}」的類型「{recipe.get('type')}」不是 {'、'.join(CATEGORY_RATIOS)} 之一")
+        for ingredient, weight in recipe.get("ingredients", {}).items():
+            if not isinstance(weight, (int, float)) or weight <= 0:
+                problems.append(f"「{name}」中「{ingredient}」的重量 {weight!r} 必須為正數")
+            if aliases.get(ingredient, ingredient) not in nutrition_data:
+                unresolved.setdefault(ingredient, []).append(name)
+
+    for ingredient, recipe_names in unresolved.items():
+        suggestions = "、".join(suggest_ingredients(ingredient, nutrition_data)) or "無"
+        problems.append(
+            f"食材「{ingredient}」不在營養表中（用於 {'、'.join(recipe_names)}）；"
+            f"相近的食材：{suggestions}。請補上營養數據或在 ingredient_aliases.json 加入對應"
+        )
+    return problems
+
+
+# 驗證失敗時拋出 DataValidationError
+def check_data(recipes, nutrition_data, aliases=None):
+    problems = validate_data(recipes, nutrition_data, aliases)
+    if problems:
+        raise DataValidationError(problems)
+
+
+if __name__ == "__main__":
+    # 用法：python data_validation.py [recipes.json] [ingredients_nutrition.json] [ingredient_aliases.json]
+    paths = sys.argv[1:] + ["recipes.json", "ingredients_nutrition.json", "ingredient_aliases.json"][len(sys.argv) - 1:]
+    loaded = []
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                loaded.append(json.load(file))
+        except FileNotFoundError:
+            loaded.append({})
+    problems = validate_data(*loaded)
+    for problem in problems:
+        print(problem)
+    print("數據檢查通過" if not problems else f"共 {len(problems)} 個問題")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,66 @@
+import json
+import os
+
+import numpy as np
+
+# 食材價格表：食材 → 每公斤價格（元），名稱與 ingredients_nutrition.json 相同，亦可使用別名。
+# 引擎把價格當作營養矩陣的額外一欄，與營養成分在同一次稀疏矩陣乘法中算出每道菜每份的成本；
+# 菜單成本為份數 × 每份成本，與營養總和一樣以陣列運算求得（見 NutritionEngine.menu_cost）。
+# 注意：隨附的 ingredient_prices.json 是佔位用的估計值，沒有出處與調查日期，只供測試成本模式；
+# 正式估算成本或設定預算前，請換成實際採購單價。
+
+PRICES_PATH = "ingredient_prices.json"
+
+
+# 預設的價格表：與 recipes.json 放在同一目錄
+def default_prices_path(recipes_path):
+    return os.path.join(os.path.dirname(os.path.abspath(recipes_path)), PRICES_PATH)
+
+
+# 讀取價格表；檔案不存在時所有食材都沒有價格
+def load_prices(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+# 依引擎的食材順序排列的每公斤價格，以及各食材是否有價格；沒有價格的食材以 0 計
+def price_vector(engine, prices):
+    values = np.zeros(len(engine.ingredient_names), dtype=np.float64)
+    priced = np.zeros(len(engine.ingredient_names), dtype=bool)
+    for name, price in prices.items():
+        ingredient_id = engine.ingredient_index.get(engine.aliases.get(name, name))
+        if ingredient_id is not None:
+            values[ingredient_id] = price
+            priced[ingredient_id] = True
+    return values, priced
+
+
+# 菜譜用到但沒有價格的食材 → 使用的菜名
+def unpriced_ingredients(engine, priced):
+    entry_recipes = np.repeat(np.arange(len(engine.recipes)), np.diff(engine.indptr))
+    missing = {}
+    for entry in np.flatnonzero(~priced[engine.indices]).tolist():
+        names = missing.setdefault(engine.ingredient_names[engine.indices[entry]], [])
+        name = engine.recipes[entry_recipes[entry]]["name"]
+        if name not in names:
+            names.append(name)
+    return missing
+
+
+# 菜單（build_menu_item 格式的 dict 清單）的食材成本（元）
+def menu_cost(engine, menu):
+    recipe_ids = [engine.recipe_index[item["name"]] for item in menu]
+    return float(engine.menu_cost(recipe_ids, [item["portions"] for item in menu]))
+
+
+# 週菜單每天的食材成本與每人每餐平均成本（元），供批次輸出與 API 使用
+def weekly_menu_costs(engine, weekly_menu, total_people):
+    days = {day: round(menu_cost(engine, menu), 1) for day, menu in weekly_menu.items() if menu}
+    total = float(sum(days.values()))
+    return {
+        "days": days,
+        "total": round(total, 1),
+        "per_head_meal": round(total / (total_people * len(days)), 2) if total_people and days else None,
+    }
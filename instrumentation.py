@@ -0,0 +1,128 @@
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# 輕量計時工具：各階段累計耗時與計數器，每次請求（例如按下「生成 5 天菜單」）寫一筆 JSON Lines 記錄
+# 記錄檔位置由環境變數 LUNCH_TIMING_LOG 指定；LUNCH_PROFILE=1 時每次請求都以 cProfile 取樣
+
+TIMING_LOG = os.environ.get("LUNCH_TIMING_LOG", "timings.jsonl")
+PROFILE_BY_DEFAULT = os.environ.get("LUNCH_PROFILE") == "1"
+
+_lock = threading.Lock()
+_stages = {}  # 階段 -> {"count", "total_s", "max_s"}
+_counters = {}
+_last_request = None
+_current = contextvars.ContextVar("current_request", default=None)
+
+
+# 計時一個階段；在 request() 之內時同時記入該次請求
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            stats = _stages.setdefault(stage, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+            stats["count"] += 1
+            stats["total_s"] += elapsed
+            stats["max_s"] = max(stats["max_s"], elapsed)
+        record = _current.get()
+        if record is not None:
+            record["stages"][stage] = record["stages"].get(stage, 0.0) + elapsed * 1000
+
+
+# 累加計數器
+def increment(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+    record = _current.get()
+    if record is not None:
+        record["counters"][name] = record["counters"].get(name, 0) + amount
+
+
+# 一次請求：結束時寫入記錄檔；profile 為 True 時以 cProfile 取樣並保留前幾名的函式
+@contextmanager
+def request(name, log_path=None, profile=None, **fields):
+    global _last_request
+    record = {
+        "request": name,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        **fields,
+        "stages": {},
+        "counters": {},
+    }
+    token = _current.set(record)
+    profiler = cProfile.Profile() if (PROFILE_BY_DEFAULT if profile is None else profile) else None
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record["total_ms"] = (time.perf_counter() - start) * 1000
+        _current.reset(token)
+        record["stages"] = {stage: round(ms, 3) for stage, ms in record["stages"].items()}
+        record["total_ms"] = round(record["total_ms"], 3)
+        write_record(record, log_path)
+        if profiler is not None:
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(25)
+            record["profile"] = output.getvalue()
+        with _lock:
+            _last_request = record
+
+
+# 附加一筆 JSON 記錄；無法寫入時略過，不影響請求本身
+def write_record(record, log_path=None):
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    try:
+        with _lock, open(log_path or TIMING_LOG, "a", encoding="utf-8") as file:
+            file.write(line)
+    except OSError:
+        pass
+
+
+# 各階段累計統計（毫秒）
+def stage_stats():
+    with _lock:
+        return {
+            stage: {
+                "count": stats["count"],
+                "total_ms": round(stats["total_s"] * 1000, 3),
+                "mean_ms": round(stats["total_s"] * 1000 / stats["count"], 3),
+                "max_ms": round(stats["max_s"] * 1000, 3),
+            }
+            for stage, stats in _stages.items()
+        }
+
+
+# 計數器目前的值
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+# 最近一次請求的記錄（含 cProfile 輸出時有 "profile" 欄位）
+def last_request():
+    with _lock:
+        return _last_request
+
+
+# 清除累計統計
+def reset_stats():
+    global _last_request
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _last_request = None
@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+from batch_menus import plan_site, weekly_ingredient_totals, weekly_menu_cache_key
+from data_cache import get_engine, get_result_cache
+from ingredient_prices import weekly_menu_costs
+from menu_planner import (
+    check_group_counts, default_lunch_calories, lunch_requirements, new_seed, site_stream, validate_nutrition_ratio,
+    weekly_plan_record,
+)
+from menu_solver import RATIO_BANDS
+from portion_allocation import weekly_group_portions
+from recipe_tags import excluded_tags
+
+# 以 asyncio 提供 JSON HTTP API（只用標準函式庫）：
+#   GET  /health          服務狀態
+#   POST /weekly-menu     {"group_counts": {...}, "mode": "random" | "solver" | "cost", "seed": 整數（可省略）,
+#                          "site": 名稱, "exclude_tags": [食材標籤...], "diets": [飲食限制...],
+#                          "budget": 每人每餐成本上限（cost 模式，元）（皆可省略）}
+#                         → 週菜單、每日營養比例、食材總量與成本、各族群每人份量，以及可重現此菜單的種子與數據版本；
+#                           "plan_record" 可在 app135 載入為可編輯的計畫
+#   POST /validate        {"menu": [...], "total_calories": 數值} → 營養比例檢查
+#   POST /nutrition-table {"menu": [...], "total_people": 數值} → 營養與食材表格（欄位與資料列）
+# 菜譜與營養數據只載入一次；同時收到參數相同的請求時只計算一次，選菜交由工作程序處理以免阻塞事件迴圈；
+# 求解結果存入結果快取（見 result_cache.py），重複的請求直接回應
+# 用法：python menu_api.py --port 8000 --workers 4
+
+MAX_BODY_BYTES = 1 << 20
+
+
+# 請求內容有誤時拋出，回應 400
+class BadRequest(ValueError):
+    pass
+
+
+# 檢查並正規化各族群人數（規則見 check_group_counts）
+def parse_group_counts(payload):
+    try:
+        return check_group_counts(payload.get("group_counts"))
+    except ValueError as error:
+        raise BadRequest(str(error)) from error
+
+
+# 檢查排除的食材標籤與飲食限制，回傳合併後的排除清單
+def parse_excluded_tags(payload, known_tags):
+    tags = payload.get("exclude_tags", [])
+    diets = payload.get("diets", [])
+    if not all(isinstance(values, list) and all(isinstance(value, str) for value in values) for values in (tags, diets)):
+        raise BadRequest("exclude_tags 與 diets 必須是字串清單")
+    unknown = [tag for tag in tags if tag not in known_tags]
+    if unknown:
+        raise BadRequest(f"未知的食材標籤：{'、'.join(unknown)}")
+    try:
+        return excluded_tags(tags, diets)
+    except ValueError as error:
+        raise BadRequest(str(error)) from error
+
+
+# JSON 數值（排除 true / false 與 NaN、Infinity）
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+# 檢查用戶端送來的菜單（build_menu_item 格式）：每道菜需有名稱、類型、數值營養成分與食材克數，
+# 各菜品的營養成分欄位相同且包含三大營養素
+def parse_menu(payload):
+    menu = payload.get("menu")
+    if not isinstance(menu, list):
+        raise BadRequest("menu 必須是菜品清單")
+    keys = None
+    for index, item in enumerate(menu, 1):
+        if not isinstance(item, dict):
+            raise BadRequest(f"第 {index} 道菜必須是物件")
+        if not isinstance(item.get("name"), str) or not isinstance(item.get("type"), str):
+            raise BadRequest(f"第 {index} 道菜的 name 與 type 必須是字串")
+        nutrition = item.get("nutrition")
+        if not isinstance(nutrition, dict) or not all(is_number(value) for value in nutrition.values()):
+            raise BadRequest(f"第 {index} 道菜的 nutrition 必須是營養素 → 數值的物件")
+        missing = [key for key in RATIO_BANDS if key not in nutrition]
+        if missing:
+            raise BadRequest(f"第 {index} 道菜的 nutrition 缺少：{'、'.join(missing)}")
+        if keys is None:
+            keys = set(nutrition)
+        elif set(nutrition) != keys:
+            raise BadRequest(f"第 {index} 道菜的營養素欄位與第 1 道菜不同")
+        ingredients = item.get("ingredients")
+        if not isinstance(ingredients, dict) or not all(
+                is_number(amount) and amount >= 0 for amount in ingredients.values()):
+            raise BadRequest(f"第 {index} 道菜的 ingredients 必須是食材 → 非負克數的物件")
+    return menu
+
+
+# 營養表的平均列人數，未提供時不加平均列
+def parse_total_people(payload):
+    total_people = payload.get("total_people")
+    if total_people is not None and (not is_number(total_people) or total_people <= 0):
+        raise BadRequest("total_people 必須是正數")
+    return total_people
+
+
+class MenuService:
+    def __init__(self, recipes_path="recipes.json", nutrition_path="ingredients_nutrition.json", workers=None):
+        self.recipes_path = recipes_path
+        self.nutrition_path = nutrition_path
+        self.engine = get_engine(recipes_path, nutrition_path)
+        self.pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+        self.pending = {}  # 請求鍵 -> 進行中的計算（Task）
+        self.stats = {"requests": 0, "coalesced": 0}
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    # 相同鍵的請求進行中時等待同一個結果，不重複計算；個別連線中斷不會取消共用的計算
+    async def coalesce(self, key, compute):
+        self.stats["requests"] += 1
+        task = self.pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self.pending[key] = task
+            task.add_done_callback(lambda _: self.pending.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    async def health(self, payload):
+        return {"status": "ok", "recipes": len(self.engine.recipes), **self.stats,
+                "result_cache": dict(get_result_cache().stats)}
+
+    async def weekly_menu(self, payload):
+        group_counts = parse_group_counts(payload)
+        mode = payload.get("mode", "random")
+        if mode not in ("random", "solver", "cost"):
+            raise BadRequest("mode 必須是 random、solver 或 cost")
+        budget = payload.get("budget") if mode == "cost" else None
+        if budget is not None and (not is_number(budget) or budget <= 0):
+            raise BadRequest("budget 必須是正數")
+        seed = payload.get("seed")
+        if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or seed < 0):
+            raise BadRequest("seed 必須是非負整數")
+        site_name = payload.get("site")
+        excluded = parse_excluded_tags(payload, self.engine.tags.tags)
+        key = ("weekly-menu", mode, seed, site_name, tuple(group_counts.values()), tuple(sorted(excluded)), budget)
+        lunch_calories = default_lunch_calories()
+
+        async def compute():
+            # 沒有指定種子時由這裡產生，合併的請求共用同一個種子
+            plan_seed = None if mode != "random" else seed if seed is not None else new_seed()
+            cache_key = weekly_menu_cache_key(group_counts, lunch_calories, mode, plan_seed,
+                                              (site_stream(site_name),) if mode == "random" else (),
+                                              self.recipes_path, self.nutrition_path, excluded, budget)
+            weekly_menu = get_result_cache().get(cache_key)
+            if weekly_menu is None:
+                site = {"site": site_name, "group_counts": group_counts, "exclude_tags": excluded}
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self.pool, plan_site, site, mode, self.recipes_path, self.nutrition_path, plan_seed, budget
+                )
+                weekly_menu = result["weekly_menu"]
+                get_result_cache().put(cache_key, weekly_menu)
+            _, total_calories_needed = lunch_requirements(group_counts, lunch_calories)
+            return {
+                "site": site_name,
+                "group_counts": group_counts,
+                "seed": plan_seed,
+                "excluded_tags": excluded,
+                "data_version": self.engine.data_version,
+                "weekly_menu": weekly_menu,
+                "ingredient_totals": weekly_ingredient_totals(weekly_menu),
+                "cost": weekly_menu_costs(self.engine, weekly_menu, sum(group_counts.values())),
+                "group_portions": weekly_group_portions(self.engine, weekly_menu, lunch_calories, group_counts),
+                "plan_record": weekly_plan_record(self.engine, weekly_menu, plan_seed, excluded),
+                "validation": {
+                    day: validate_nutrition_ratio(menu, total_calories_needed) if menu else None
+                    for day, menu in weekly_menu.items()
+                },
+            }
+
+        return await self.coalesce(key, compute)
+
+    async def validate(self, payload):
+        menu = parse_menu(payload)
+        total_calories = payload.get("total_calories")
+        if not is_number(total_calories) or total_calories <= 0:
+            raise BadRequest("total_calories 必須是正數")
+        return validate_nutrition_ratio(menu, total_calories)
+
+    async def nutrition_table(self, payload):
+        from menu_tables import build_nutrition_table_with_ingredients
+
+        menu = parse_menu(payload)
+        table = build_nutrition_table_with_ingredients(menu, parse_total_people(payload))
+        return {"columns": list(table.columns), "rows": table.values.tolist()}
+
+
+ROUTES = {
+    ("GET", "/health"): MenuService.health,
+    ("POST", "/weekly-menu"): MenuService.weekly_menu,
+    ("POST", "/validate"): MenuService.validate,
+    ("POST", "/nutrition-table"): MenuService.nutrition_table,
+}
+
+
+async def write_response(writer, status, body):
+    data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(data)}\r\n"
+        f"Connection: close\r\n\r\n".encode("ascii") + data
+    )
+    await writer.drain()
+
+
+# 處理單一連線的一個 HTTP 請求
+async def handle_connection(service, reader, writer):
+    try:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            return
+        method, path, _ = request_line
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        route = ROUTES.get((method, path.split("?", 1)[0]))
+        if route is None:
+            known = any(route_path == path.split("?", 1)[0] for _, route_path in ROUTES)
+            status = HTTPStatus.METHOD_NOT_ALLOWED if known else HTTPStatus.NOT_FOUND
+            await write_response(writer, status, {"error": status.phrase})
+            return
+
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            await write_response(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "請求內容過大"})
+            return
+        body = await reader.readexactly(length) if length else b""
+        try:
+            payload = json.loads(body) if body else {}
+            if not isinstance(payload, dict):
+                raise BadRequest("請求內容必須是 JSON 物件")
+            result = await route(service, payload)
+        except (json.JSONDecodeError, BadRequest) as error:
+            await write_response(writer, HTTPStatus.BAD_REQUEST, {"error": str(error)})
+        except Exception as error:
+            await write_response(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(error)})
+        else:
+            await write_response(writer, HTTPStatus.OK, result)
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host="127.0.0.1", port=8000, workers=None, recipes_path="recipes.json",
+                nutrition_path="ingredients_nutrition.json"):
+    service = MenuService(recipes_path, nutrition_path, workers)
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    print(f"菜單 API 已啟動：http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以 HTTP JSON API 提供菜單生成")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="選菜工作程序數，預設為 CPU 核心數")
+    parser.add_argument("--recipes", default="recipes.json")
+    parser.add_argument("--nutrition", default="ingredients_nutrition.json")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.recipes, args.nutrition))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
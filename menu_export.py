@@ -0,0 +1,159 @@
+import csv
+import importlib.util
+import io
+import os
+
+import numpy as np
+
+from menu_tables import build_nutrition_table_with_ingredients
+
+# 匯出菜單表格：表格逐一寫出後即釋放，記憶體用量與週數、場域數無關
+#   XLSX：每個場域一個工作表，各天的表格依序往下排（xlsxwriter 的 constant_memory 模式逐列寫出，需要 xlsxwriter）
+#   CSV：每張表一段（標題列、欄名、資料列，段落之間空一列），以 UTF-8 BOM 編碼方便 Excel 開啟
+#   Parquet：長表格式（site, day, dish, type, item, value），每張表一個 row group（需要 pyarrow）
+
+EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+SHEET_NAME_LIMIT = 31
+INVALID_SHEET_CHARACTERS = str.maketrans({character: "_" for character in "[]:*?/\\"})
+
+
+# 週菜單每天的表格（產生器）：產出 (場域, 天, 表格)
+def weekly_menu_tables(weekly_menu, site=None, total_people=None):
+    for day, menu in weekly_menu.items():
+        if menu:
+            yield site, day, build_nutrition_table_with_ingredients(menu, total_people, ingredient_suffix=" (g)")
+
+
+def _title(site, day):
+    return f"{site} {day}" if site else str(day)
+
+
+class CsvTableWriter:
+    def __init__(self, target):
+        self._owns = isinstance(target, (str, os.PathLike))
+        self._file = (open(target, "w", encoding="utf-8-sig", newline="") if self._owns
+                      else io.TextIOWrapper(target, encoding="utf-8-sig", newline=""))
+        self._writer = csv.writer(self._file)
+        self._first = True
+
+    def add(self, site, day, table):
+        if not self._first:
+            self._writer.writerow([])
+        self._first = False
+        self._writer.writerow([_title(site, day)])
+        self._writer.writerow(table.columns)
+        self._writer.writerows(table.itertuples(index=False))
+
+    def close(self):
+        if self._owns:
+            self._file.close()
+        else:
+            self._file.flush()
+            self._file.detach()  # 呼叫端提供的檔案保持開啟
+
+
+class XlsxTableWriter:
+    def __init__(self, target):
+        try:
+            import xlsxwriter
+        except ImportError:
+            raise ImportError("輸出 XLSX 需要安裝 xlsxwriter") from None
+        self._workbook = xlsxwriter.Workbook(target, {"constant_memory": True})
+        self._bold = self._workbook.add_format({"bold": True})
+        self._sheets = {}  # 場域 -> [工作表, 下一列]
+        self._names = set()
+
+    # 工作表名稱最多 31 字、不可含特殊字元且不分大小寫不可重複
+    def _sheet_name(self, site):
+        base = (str(site) if site else "菜單").translate(INVALID_SHEET_CHARACTERS)[:SHEET_NAME_LIMIT]
+        name, number = base, 1
+        while name.lower() in self._names:
+            number += 1
+            suffix = f"~{number}"
+            name = base[:SHEET_NAME_LIMIT - len(suffix)] + suffix
+        self._names.add(name.lower())
+        return name
+
+    def add(self, site, day, table):
+        if site not in self._sheets:
+            self._sheets[site] = [self._workbook.add_worksheet(self._sheet_name(site)), 0]
+        sheet, row = self._sheets[site]
+        sheet.write(row, 0, str(day), self._bold)
+        sheet.write_row(row + 1, 0, list(table.columns), self._bold)
+        for offset, values in enumerate(table.itertuples(index=False), 2):
+            sheet.write_row(row + offset, 0, values)
+        self._sheets[site][1] = row + len(table) + 3
+
+    def close(self):
+        self._workbook.close()
+
+
+class ParquetTableWriter:
+    def __init__(self, target):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("輸出 Parquet 需要安裝 pyarrow") from None
+        self._pa = pa
+        self._schema = pa.schema([
+            ("site", pa.string()), ("day", pa.string()), ("dish", pa.string()),
+            ("type", pa.string()), ("item", pa.string()), ("value", pa.float64()),
+        ])
+        self._writer = pq.ParquetWriter(target, self._schema, compression="zstd")
+
+    # 寬表轉為長表：每道菜的每個數值欄位一列
+    def add(self, site, day, table):
+        values = table.iloc[:, 2:].to_numpy(dtype=np.float64)
+        items = list(table.columns[2:])
+        rows, columns = values.shape
+        self._writer.write_table(self._pa.table({
+            "site": [None if site is None else str(site)] * values.size,
+            "day": [str(day)] * values.size,
+            "dish": np.repeat(table["菜品"].to_numpy(dtype=object), columns).tolist(),
+            "type": np.repeat(table["類型"].to_numpy(dtype=object), columns).tolist(),
+            "item": items * rows,
+            "value": values.ravel(),
+        }, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+WRITERS = {"xlsx": XlsxTableWriter, "csv": CsvTableWriter, "parquet": ParquetTableWriter}
+
+
+# 依格式（或路徑副檔名）開啟表格寫入器；target 為路徑或可寫入的二進位檔案
+def open_table_writer(target, fmt=None):
+    if fmt is None:
+        fmt = os.path.splitext(str(target))[1].lstrip(".").lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"不支援的匯出格式：{fmt}（可用 {'、'.join(WRITERS)}）")
+    return WRITERS[fmt](target)
+
+
+# 將 (場域, 天, 表格) 的產生器逐一寫出
+def export_tables(tables, target, fmt=None):
+    writer = open_table_writer(target, fmt)
+    try:
+        for site, day, table in tables:
+            writer.add(site, day, table)
+    finally:
+        writer.close()
+
+
+# 匯出為位元組，供下載按鈕使用
+def export_bytes(tables, fmt):
+    buffer = io.BytesIO()
+    export_tables(tables, buffer, fmt)
+    return buffer.getvalue()
+
+
+# 目前環境可用的匯出格式（缺少選用套件的格式不列出）
+def available_formats():
+    required = {"xlsx": "xlsxwriter", "csv": None, "parquet": "pyarrow"}
+    return [fmt for fmt, module in required.items() if module is None or importlib.util.find_spec(module) is not None]
@@ -0,0 +1,319 @@
+import hashlib
+
+import numpy as np
+
+from menu_solver import CALORIES_PER_GRAM, CATEGORY_RATIOS, PROTEIN_ROTATION, RATIO_BANDS
+from menu_types import MenuCatalog
+from nutrition_engine import round_amounts
+from nutrient_schema import NUTRIENT_LIMITS, limit_bands
+from recipe_usage import RecipeUsage
+
+DAYS_PER_WEEK = 5
+
+# 各族群每日熱量需求與午餐佔比
+CALORIES_PER_DAY = {
+    "幼兒_男": 1400, "幼兒_女": 1300,
+    "國小_男": 1800, "國小_女": 1600,
+    "成人_男": 2500, "成人_女": 2000,
+}
+LUNCH_RATIO = 0.4
+
+
+# 產生新的計畫種子；記錄下來即可重現同一份菜單
+def new_seed():
+    return int(np.random.SeedSequence().generate_state(1)[0])
+
+
+# 第 day 天的亂數串流，只由 (種子, 串流編號..., 天) 決定：
+# 各天、各場域互相獨立，平行或只重新產生部分天數時，結果與依序產生相同
+def day_rng(seed, day, stream=()):
+    return np.random.default_rng([seed, *stream, day])
+
+
+# 將場域名稱轉為固定的串流編號
+def site_stream(site):
+    return int.from_bytes(hashlib.sha256(str(site).encode("utf-8")).digest()[:8], "little")
+
+
+# 各族群午餐熱量
+def default_lunch_calories(calories_per_day=CALORIES_PER_DAY, lunch_ratio=LUNCH_RATIO):
+    return {group: int(cal * lunch_ratio) for group, cal in calories_per_day.items()}
+
+
+# 檢查並正規化各族群人數：只接受已知族群、非負整數，且至少 1 人；有誤時拋出 ValueError
+def check_group_counts(group_counts):
+    if not isinstance(group_counts, dict):
+        raise ValueError("group_counts 必須是物件")
+    unknown = set(group_counts) - set(CALORIES_PER_DAY)
+    if unknown:
+        raise ValueError(f"未知的族群：{'、'.join(sorted(unknown))}")
+    parsed = {}
+    for group in CALORIES_PER_DAY:
+        count = group_counts.get(group, 0)
+        if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+            raise ValueError(f"{group} 的人數必須是非負整數")
+        parsed[group] = count
+    if not sum(parsed.values()):
+        raise ValueError("用餐人數至少要有 1 人")
+    return parsed
+
+
+# 午餐總人數與總熱量需求
+def lunch_requirements(group_counts, lunch_calories):
+    total_people = sum(group_counts.values())
+    total_calories_needed = sum(count * lunch_calories[group] for group, count in group_counts.items())
+    return total_people, total_calories_needed
+
+
+# 檢查每日營養：三大營養素佔總熱量比例（%），以及菜單有提供且設有上下限的營養素每 1000 大卡含量
+# （見 nutrient_schema.NUTRIENT_LIMITS）；所有項目以同一個陣列一次比對範圍，總熱量不大於 0 時拋出 ValueError
+def validate_nutrition_ratio(menu_summary, total_calories, limits=NUTRIENT_LIMITS):
+    if total_calories <= 0:
+        raise ValueError("總熱量必須大於 0")
+    keys = list(menu_summary[0]["nutrition"]) if menu_summary else list(RATIO_BANDS)
+    limit_keys, _, limit_ranges = limit_bands(keys, limits)
+    columns = list(RATIO_BANDS) + limit_keys
+    totals = np.zeros(len(columns))
+    for item in menu_summary:
+        totals += [item["nutrition"][key] for key in columns]
+
+    factors = [CALORIES_PER_GRAM[key] for key in RATIO_BANDS] + [10] * len(limit_keys)
+    values = totals * factors / total_calories * 100
+    bands = np.vstack([np.array(list(RATIO_BANDS.values()), dtype=np.float64), limit_ranges])
+    within = (values >= bands[:, 0]) & (values <= bands[:, 1])
+
+    result = {key: round(float(value), 1) for key, value in zip(RATIO_BANDS, values.tolist())}
+    if limit_keys:
+        result["limits"] = {key: round(float(value), 1) for key, value in zip(limit_keys, values[len(RATIO_BANDS):])}
+    result["violations"] = [key for key, ok in zip(columns, within.tolist()) if not ok]
+    result["valid"] = bool(within.all())
+    return result
+
+
+# 依類型熱量計算單道菜的份數、食材與營養；熱量為 0 的菜品回傳 None
+# total_people 為 None 時份數不設上限
+def build_menu_item(engine, recipe, category_calories, total_people):
+    recipe_nutrition = engine.recipe_nutrition(recipe)
+    if recipe_nutrition["熱量"] == 0:
+        return None
+    portions = round_amounts(category_calories / recipe_nutrition["熱量"])
+    if total_people is not None:
+        portions = min(portions, total_people)
+
+    total_ingredients = {ing: round_amounts(weight * portions) for ing, weight in recipe["ingredients"].items()}
+    total_nutrition = engine.scaled_nutrition(recipe, portions)
+    return {
+        "name": recipe["name"],
+        "type": recipe["type"],
+        "calories": total_nutrition["熱量"],
+        "nutrition": total_nutrition,
+        "portions": portions,
+        "ingredients": total_ingredients
+    }
+
+
+# 計算單天菜單；rng 為 numpy 亂數產生器，未提供時不可重現
+def calculate_menu_for_day(group_counts, lunch_calories, engine, day, used_recipes, rotate_protein=True, rng=None,
+                           excluded_tags=()):
+    total_people, total_calories_needed = lunch_requirements(group_counts, lunch_calories)
+    return select_day_menu(engine, total_calories_needed, total_people, day, used_recipes, rotate_protein, rng,
+                           excluded_tags)
+
+
+# 依總熱量選出單天菜單；rotate_protein 為 True 時主菜依星期輪替肉品
+# excluded_tags 中任一標籤（過敏原、飲食限制，見 recipe_tags.py）的菜品不列入選擇
+def select_day_menu(engine, total_calories_needed, total_people, day, used_recipes, rotate_protein=True, rng=None,
+                    excluded_tags=()):
+    if rng is None:
+        rng = np.random.default_rng()
+    category_calories = {category: total_calories_needed * ratio for category, ratio in CATEGORY_RATIOS.items()}
+    weekday = (day - 1) % DAYS_PER_WEEK + 1
+    tags = engine.tags
+    allowed = tags.query(exclude=excluded_tags)
+
+    menu_summary = []
+
+    for category in CATEGORY_RATIOS:
+        # 該類型中符合限制且近期未使用的菜品
+        candidates = tags.query([category], within=allowed)
+        candidates = tags.from_ids(used_recipes.available(tags.ids(candidates), day))
+
+        # 主菜根據星期選擇肉品；無符合條件的主菜時不限制肉品
+        if category == "主菜" and rotate_protein:
+            meat_candidates = tags.query([PROTEIN_ROTATION[weekday - 1]], within=candidates)
+            if tags.count(meat_candidates):
+                candidates = meat_candidates
+
+        available_recipes = tags.ids(candidates)
+        if not len(available_recipes):
+            continue  # 如果該類型沒有菜品可選，跳過
+        selected_recipe = engine.recipes[available_recipes[rng.integers(len(available_recipes))]]
+
+        # 計算該菜品的營養成分和食材數量
+        item = build_menu_item(engine, selected_recipe, category_calories[category], total_people)
+        if item is None:
+            continue
+        menu_summary.append(item)
+
+        # 記錄已選菜品
+        used_recipes.mark(engine.recipe_id(selected_recipe), day)
+
+    return menu_summary
+
+
+# 為 5 天生成菜單；相同的 seed 與 stream（例如場域的串流編號）得到相同菜單
+def generate_weekly_menu(group_counts, lunch_calories, engine, repeat_window=None, seed=None, stream=(),
+                         excluded_tags=()):
+    if seed is None:
+        seed = new_seed()
+    weekly_menu = {}
+    used_recipes = RecipeUsage(len(engine.recipes), repeat_window)  # 全局已使用菜品記錄
+
+    for day in range(1, DAYS_PER_WEEK + 1):  # 1 到 5 天
+        daily_menu = calculate_menu_for_day(group_counts, lunch_calories, engine, day, used_recipes,
+                                            rng=day_rng(seed, day, stream), excluded_tags=excluded_tags)
+        weekly_menu[f"Day {day}"] = daily_menu
+
+    return weekly_menu
+
+
+# 依人數重新計算多天菜單的份量（菜品不變）：所有天的菜品一次以陣列運算放大，回傳每天的 MenuItem 清單
+# days 為每天選定的菜品編號清單；份量與總熱量成正比，人數變動時不需重新選菜
+def scale_menus(catalog, days, total_people, total_calories_needed):
+    recipe_ids = [recipe_id for recipe_ids in days for recipe_id in recipe_ids]
+    shares = np.array([CATEGORY_RATIOS[catalog.recipes[recipe_id].type] for recipe_id in recipe_ids])
+    items = catalog.scaled_items(recipe_ids, total_calories_needed * shares, total_people)
+    by_recipe = {item.recipe_id: item for item in items}
+    return [[by_recipe[recipe_id] for recipe_id in recipe_ids if recipe_id in by_recipe] for recipe_ids in days]
+
+
+# 可存成 JSON 的計畫記錄：種子、數據版本與每天選定的菜名，MenuPlan.from_record 可還原成可編輯的計畫
+def plan_record(engine, seed, days, repeat_window=None, excluded_tags=(), revisions=None, locked=()):
+    weeks = max(1, -(-len(days) // DAYS_PER_WEEK))
+    return {
+        "seed": seed,
+        "data_version": engine.data_version,
+        "weeks": weeks,
+        "repeat_window": repeat_window,
+        "excluded_tags": list(excluded_tags),
+        "revisions": list(revisions) if revisions is not None else [0] * (weeks * DAYS_PER_WEEK),
+        "locked": list(locked),
+        "days": days,
+    }
+
+
+# 週菜單（generate_weekly_menu 或求解結果的 dict）的計畫記錄，供批次輸出與 API 使用
+def weekly_plan_record(engine, weekly_menu, seed=None, excluded_tags=()):
+    return plan_record(engine, seed, [[item["name"] for item in menu] for menu in weekly_menu.values()],
+                       excluded_tags=excluded_tags)
+
+
+# 多週菜單計畫：保留每天選定的菜品，可鎖定天數、替換菜品，只重新計算受影響的天數
+# 快取中的菜單以精簡的 MenuItem 保存（見 menu_types.py），取用時才轉為 dict
+# 每天的選菜使用由 (seed, 重新產生次數, 天) 決定的亂數串流，to_record() 可保存計畫供日後重現
+class MenuPlan:
+    def __init__(self, engine, weeks=1, repeat_window=None, seed=None, excluded_tags=()):
+        self.engine = engine
+        self.catalog = MenuCatalog(engine)
+        self.weeks = weeks
+        self.day_count = weeks * DAYS_PER_WEEK
+        self.repeat_window = repeat_window
+        self.seed = seed if seed is not None else new_seed()
+        self.excluded_tags = list(excluded_tags)  # 不可選用的食材標籤（過敏原、飲食限制）
+        # 第 day 天選定的菜品編號（第 0 列不使用），-1 表示空位
+        self.schedule = np.full((self.day_count + 1, len(CATEGORY_RATIOS)), -1, dtype=np.int64)
+        self.revisions = np.zeros(self.day_count + 1, dtype=np.int64)  # 每天已重新產生的次數
+        self.locked = set()
+        self._menus = {}  # day -> (快取鍵, 當日 MenuItem 清單)
+
+    def days(self):
+        return range(1, self.day_count + 1)
+
+    def recipe_ids(self, day):
+        return [int(recipe_id) for recipe_id in self.schedule[day] if recipe_id >= 0]
+
+    # 與 RecipeUsage 相同介面：前後 repeat_window 天內（None 為整個計畫）其他天已用的菜品不可再選
+    def available(self, recipe_ids, day):
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        if self.repeat_window is None:
+            nearby = np.r_[1:day, day + 1:self.day_count + 1]
+        else:
+            first = max(1, day - self.repeat_window)
+            last = min(self.day_count, day + self.repeat_window)
+            nearby = np.r_[first:day, day + 1:last + 1]
+        return recipe_ids[~np.isin(recipe_ids, self.schedule[nearby])]
+
+    def mark(self, recipe_id, day):
+        row = self.schedule[day]
+        row[np.flatnonzero(row < 0)[0]] = recipe_id
+
+    def lock(self, day):
+        self.locked.add(day)
+
+    def unlock(self, day):
+        self.locked.discard(day)
+
+    # 重新選擇指定天數（預設全部）中未鎖定的菜品，其他天的選擇與快取保持不變
+    def regenerate(self, group_counts, lunch_calories, days=None):
+        for day in days if days is not None else self.days():
+            if day in self.locked:
+                continue
+            self.schedule[day] = -1
+            rng = day_rng(self.seed, day, (int(self.revisions[day]),))
+            self.revisions[day] += 1
+            menu = calculate_menu_for_day(group_counts, lunch_calories, self.engine, day, self, rng=rng,
+                                          excluded_tags=self.excluded_tags)
+            self._menus[day] = (self._cache_key(day, group_counts, lunch_calories), self.catalog.from_dicts(menu))
+
+    # 將某天的一道菜換成另一道（同類型），只重新計算該天
+    def swap(self, day, old_recipe_id, new_recipe_id):
+        row = self.schedule[day]
+        row[np.flatnonzero(row == old_recipe_id)[0]] = new_recipe_id
+
+    # 可存成 JSON 的計畫記錄（見 plan_record）
+    def to_record(self):
+        days = [[self.engine.recipes[recipe_id]["name"] for recipe_id in self.recipe_ids(day)] for day in self.days()]
+        return plan_record(self.engine, self.seed, days, self.repeat_window, self.excluded_tags,
+                           self.revisions[1:].tolist(), sorted(self.locked))
+
+    # 由計畫記錄還原；數據版本不同時菜品可能已改變，拋出 ValueError
+    @classmethod
+    def from_record(cls, engine, record):
+        if record.get("data_version") and engine.data_version and record["data_version"] != engine.data_version:
+            raise ValueError(f"計畫使用的數據版本 {record['data_version']} 與目前的 {engine.data_version} 不同")
+        plan = cls(engine, record["weeks"], record["repeat_window"], record["seed"], record.get("excluded_tags", ()))
+        plan.revisions[1:] = record["revisions"]
+        plan.locked = set(record["locked"])
+        for day, names in enumerate(record["days"], 1):
+            for name in names:
+                plan.mark(engine.recipe_index[name], day)
+        return plan
+
+    def _cache_key(self, day, group_counts, lunch_calories):
+        return tuple(self.schedule[day].tolist()), lunch_requirements(group_counts, lunch_calories)
+
+    # 某天的菜單項目（MenuItem）；菜品與人數未變動時直接使用快取
+    def menu_items(self, day, group_counts, lunch_calories):
+        key = self._cache_key(day, group_counts, lunch_calories)
+        cached = self._menus.get(day)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        items = scale_menus(self.catalog, [self.recipe_ids(day)], *key[1])[0]
+        self._menus[day] = (key, items)
+        return items
+
+    # 某天的菜單（與 build_menu_item 相同格式的 dict）
+    def menu(self, day, group_counts, lunch_calories):
+        return self.catalog.to_dicts(self.menu_items(day, group_counts, lunch_calories))
+
+    # 某天的食材總量（克）
+    def ingredient_totals(self, day, group_counts, lunch_calories):
+        grams = self.catalog.ingredient_grams(self.menu_items(day, group_counts, lunch_calories))
+        return {self.catalog.ingredient_names[i]: float(grams[i]) for i in np.flatnonzero(grams).tolist()}
+
+    # 整個計畫的食材總量（克）
+    def plan_ingredient_totals(self, group_counts, lunch_calories):
+        items = [item for day in self.days() for item in self.menu_items(day, group_counts, lunch_calories)]
+        grams = round_amounts(self.catalog.ingredient_grams(items))
+        return {self.catalog.ingredient_names[i]: float(grams[i]) for i in np.flatnonzero(grams).tolist()}
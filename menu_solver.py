@@ -0,0 +1,250 @@
+import heapq
+import time
+
+import numpy as np
+
+from nutrient_schema import NUTRIENT_LIMITS, limit_bands
+from nutrition_engine import NUTRIENT_KEYS, round_amounts
+
+# 各類菜品熱量分配比例
+CATEGORY_RATIOS = {"主食": 0.3, "主菜": 0.4, "副菜": 0.2, "湯品": 0.1}
+
+# 三大營養素佔總熱量比例範圍（%）與每克熱量
+RATIO_BANDS = {"蛋白質": (15, 25), "脂肪": (20, 30), "碳水化合物": (50, 60)}
+CALORIES_PER_GRAM = {"蛋白質": 4, "脂肪": 9, "碳水化合物": 4}
+
+# 求解目標：營養比例最接近範圍中心，或食材成本最低（營養比例仍需全部合格）
+OBJECTIVES = ("ratio", "cost")
+
+# 主菜肉品輪替：1, 3, 5 天豬肉，2, 4 天雞肉（肉品依食材分類的標籤判斷，見 recipe_tags.py）
+PROTEIN_ROTATION = ["豬肉", "雞肉", "豬肉", "雞肉", "豬肉"]
+
+
+# 列舉單日組合時每批展開的列數上限，兩批之間檢查求解時間
+EXPAND_ROWS = 1 << 18
+
+
+# 求解時間用盡
+class SolverTimeout(Exception):
+    pass
+
+
+# 每道菜在指定總熱量下的份數（與 calculate_menu_for_day 相同的四捨五入與人數上限）
+def recipe_portions(engine, total_calories, total_people, category_ratios=CATEGORY_RATIOS):
+    shares = np.zeros(len(engine.recipes))
+    for category, ratio in category_ratios.items():
+        shares[engine.category_index.get(category, [])] = ratio
+    calories = engine.recipe_nutrition_matrix[:, 0]
+    portions = np.divide(total_calories * shares, calories, out=np.zeros(len(engine.recipes)), where=calories != 0)
+    return np.minimum(round_amounts(portions), total_people)
+
+
+# 每道菜對當日三大營養素熱量比例（%）的貢獻；引擎提供設有上下限的營養素時（見 nutrient_schema.py），
+# 其每 1000 大卡含量接在後面，各欄皆可直接加總後與 constraint_bands 比對
+def ratio_contributions(engine, portions, total_calories, limits=NUTRIENT_LIMITS):
+    _, limit_columns, _ = limit_bands(engine.nutrient_keys, limits)
+    columns = [NUTRIENT_KEYS.index(key) for key in RATIO_BANDS] + limit_columns
+    factors = np.array([CALORIES_PER_GRAM[key] for key in RATIO_BANDS] + [10] * len(limit_columns), dtype=np.float64)
+    totals = round_amounts(engine.recipe_nutrition_matrix[:, columns] * portions[:, None])
+    return totals * factors / total_calories * 100
+
+
+# 與 ratio_contributions 各欄對應的 [下限, 上限]
+def constraint_bands(engine, limits=NUTRIENT_LIMITS):
+    _, _, limit_ranges = limit_bands(engine.nutrient_keys, limits)
+    return np.vstack([np.array(list(RATIO_BANDS.values()), dtype=np.float64), limit_ranges])
+
+
+# 每道菜在當日份數下的食材成本（元）
+def dish_costs(engine, portions):
+    return engine.recipe_cost * portions
+
+
+# 與比例範圍中心的標準化距離，數值越小越好；只計三大營養素比例，其後的營養素上下限欄位不影響分數
+def ratio_score(ratios):
+    bands = np.array(list(RATIO_BANDS.values()), dtype=np.float64)
+    center = bands.mean(axis=1)
+    half_width = (bands[:, 1] - bands[:, 0]) / 2
+    return (((ratios[..., :len(RATIO_BANDS)] - center) / half_width) ** 2).sum(axis=-1)
+
+
+# 以分支定界列舉所有符合營養比例的單日組合（每類一道），回傳依目標值排序的 (組合, 目標值)
+# costs 提供時目標為當日成本（同成本時比偏離分數），否則為偏離分數；組合過多時依目標保留最有希望的部分
+# bands 為 contributions 各欄的範圍（見 constraint_bands），預設只有三大營養素比例
+# 每層分批展開，每批之前檢查 deadline（time.perf_counter() 時間），超過即拋出 SolverTimeout
+def feasible_day_combinations(category_recipes, contributions, beam_width=20000, costs=None, bands=None,
+                              deadline=None):
+    if bands is None:
+        bands = np.array(list(RATIO_BANDS.values()), dtype=np.float64)
+    # 剩餘類別可貢獻的最小值與最大值，用於剪枝
+    mins = [contributions[ids].min(axis=0) for ids in category_recipes]
+    maxs = [contributions[ids].max(axis=0) for ids in category_recipes]
+    rest_min = [np.sum(mins[i + 1:], axis=0) for i in range(len(category_recipes))]
+    rest_max = [np.sum(maxs[i + 1:], axis=0) for i in range(len(category_recipes))]
+    if costs is not None:
+        min_costs = [costs[ids].min() for ids in category_recipes]
+        rest_cost = [sum(min_costs[i + 1:]) for i in range(len(category_recipes))]
+
+    width = contributions.shape[1]
+    combos = np.zeros((1, 0), dtype=np.int64)
+    sums = np.zeros((1, width))
+    cost_sums = np.zeros(1)
+    for level, ids in enumerate(category_recipes):
+        ids = np.asarray(ids, dtype=np.int64)
+        level_contributions = contributions[ids]
+        level_costs = costs[ids] if costs is not None else np.zeros(len(ids))
+        step = max(1, EXPAND_ROWS // len(ids))
+        parts = []
+        for start in range(0, len(combos), step):
+            if deadline is not None and time.perf_counter() > deadline:
+                raise SolverTimeout
+            parents = combos[start:start + step]
+            part_sums = (sums[start:start + step, None, :] + level_contributions[None, :, :]).reshape(-1, width)
+            part_costs = (cost_sums[start:start + step, None] + level_costs[None, :]).ravel()
+            part_combos = np.hstack([np.repeat(parents, len(ids), axis=0), np.tile(ids, len(parents))[:, None]])
+            keep = np.all((part_sums + rest_min[level] <= bands[:, 1]) & (part_sums + rest_max[level] >= bands[:, 0]),
+                          axis=1)
+            parts.append((part_combos[keep], part_sums[keep], part_costs[keep]))
+        combos = np.concatenate([part[0] for part in parts]) if parts else np.zeros((0, level + 1), dtype=np.int64)
+        sums = np.concatenate([part[1] for part in parts]) if parts else np.zeros((0, width))
+        cost_sums = np.concatenate([part[2] for part in parts]) if parts else np.zeros(0)
+        if len(combos) > beam_width:
+            # 保留最接近範圍中心（或剩餘類別都選最便宜時成本最低）的部分組合
+            if costs is None:
+                optimistic = ratio_score(sums + (rest_min[level] + rest_max[level]) / 2)
+            else:
+                optimistic = cost_sums + rest_cost[level]
+            best = np.argpartition(optimistic, beam_width)[:beam_width]
+            combos, sums, cost_sums = combos[best], sums[best], cost_sums[best]
+
+    scores = ratio_score(sums)
+    if costs is None:
+        order = np.argsort(scores, kind="stable")
+        return combos[order], scores[order]
+    order = np.lexsort((scores, cost_sums))
+    return combos[order], cost_sums[order]
+
+
+# 依肉品分類菜品；同時含有多種肉品時取輪替中先出現的肉品
+def main_dish_protein(engine, rotation=PROTEIN_ROTATION):
+    protein = {}
+    for meat in dict.fromkeys(rotation or ()):
+        for recipe_id in engine.tags.ids(engine.tags.bitset(meat)).tolist():
+            protein.setdefault(recipe_id, meat)
+    return protein
+
+
+# 為整週求解營養比例全部合格且不重複的菜單，回傳最佳 top_k 組 (目標值, 每日菜品編號)
+# 引擎提供 limits 中的營養素（例如鈉、鈣）時，每天的每 1000 大卡含量也必須在範圍內
+# objective 為 "ratio" 時目標值為偏離分數總和，"cost" 時為整週食材成本（元）
+# excluded_tags 中任一標籤（過敏原、飲食限制）的菜品不列入選擇；budget 為每人每餐成本上限（元），每天都不得超過
+# time_limit（秒）自呼叫起計，涵蓋單日組合列舉與整週搜尋；時間用盡時回傳目前找到的結果（可能為空）
+def solve_weekly_menus(engine, total_calories, total_people, days=5, top_k=1, time_limit=2.0,
+                       category_ratios=CATEGORY_RATIOS, rotation=PROTEIN_ROTATION, beam_width=20000,
+                       excluded_tags=(), objective="ratio", budget=None, limits=NUTRIENT_LIMITS):
+    if objective not in OBJECTIVES:
+        raise ValueError(f"未知的求解目標：{objective}（可用 {'、'.join(OBJECTIVES)}）")
+    deadline = time.perf_counter() + time_limit
+    if total_calories <= 0:
+        return []
+    portions = recipe_portions(engine, total_calories, total_people, category_ratios)
+    contributions = ratio_contributions(engine, portions, total_calories, limits)
+    costs = dish_costs(engine, portions)
+
+    categories = list(category_ratios)
+    tags = engine.tags
+    allowed = tags.query(exclude=excluded_tags, within=tags.from_ids(np.flatnonzero(portions > 0)))
+    category_recipes = [tags.ids(tags.query([category], within=allowed)).tolist() for category in categories]
+    if any(not ids for ids in category_recipes):
+        return []
+    try:
+        combos, scores = feasible_day_combinations(category_recipes, contributions, beam_width,
+                                                   costs if objective == "cost" else None,
+                                                   constraint_bands(engine, limits), deadline)
+    except SolverTimeout:
+        return []
+    if budget is not None:
+        within_budget = costs[combos].sum(axis=1) <= budget * total_people
+        combos, scores = combos[within_budget], scores[within_budget]
+
+    # 每天依肉品輪替篩選可用組合；若某肉品沒有任何主菜，則不限制
+    main_column = categories.index("主菜") if "主菜" in categories else None
+    protein = main_dish_protein(engine, rotation)
+    day_options = []
+    for day in range(1, days + 1):
+        mask = np.ones(len(combos), dtype=bool)
+        if main_column is not None and rotation:
+            meat = rotation[(day - 1) % len(rotation)]
+            allowed = [i for i in category_recipes[main_column] if protein.get(i) == meat]
+            if allowed:
+                mask = np.isin(combos[:, main_column], allowed)
+        day_options.append((day - 1, combos[mask], scores[mask]))
+    if any(not len(options) for _, options, _ in day_options):
+        return []
+
+    results = []  # 以 (-分數, 序號, 週菜單) 維護前 top_k 名
+    seen = set()  # 同肉品的天數可互換，相同菜色組合只保留一次
+
+    # 每選定一天即刪去其他天與已用菜品衝突的組合（前向檢查），並以剩餘天數最佳分數之和作為下界
+    def search(remaining, used, chosen, score):
+        if time.perf_counter() > deadline:
+            raise SolverTimeout
+        if not remaining:
+            week = [combo for _, combo in sorted(chosen)]
+            key = frozenset(tuple(combo) for combo in week)
+            if key in seen:
+                return
+            seen.add(key)
+            entry = (-score, len(results), week)
+            if len(results) < top_k:
+                heapq.heappush(results, entry)
+            else:
+                heapq.heappushpop(results, entry)
+            return
+        # 先處理可選組合最少的一天
+        remaining = sorted(remaining, key=lambda item: len(item[1]))
+        day, options, option_scores = remaining[0]
+        rest = remaining[1:]
+        rest_bound = sum(rest_scores[0] for _, _, rest_scores in rest)
+        for combo, combo_score in zip(options, option_scores):
+            if len(results) == top_k and score + combo_score + rest_bound >= -results[0][0]:
+                break
+            used[combo] = True
+            filtered = []
+            for rest_day, rest_options, rest_scores in rest:
+                keep = ~used[rest_options].any(axis=1)
+                if not keep.any():
+                    break
+                filtered.append((rest_day, rest_options[keep], rest_scores[keep]))
+            else:
+                chosen.append((day, combo.tolist()))
+                search(filtered, used, chosen, score + combo_score)
+                chosen.pop()
+            used[combo] = False
+
+    try:
+        search(day_options, np.zeros(len(engine.recipes), dtype=bool), [], 0.0)
+    except SolverTimeout:
+        pass
+
+    return [(-neg_score, week) for neg_score, _, week in sorted(results, reverse=True)]
+
+
+# 將求解結果轉為與 calculate_menu_for_day 相同格式的當日菜單
+def build_day_menu(engine, recipe_ids, total_calories, total_people, category_ratios=CATEGORY_RATIOS):
+    portions = recipe_portions(engine, total_calories, total_people, category_ratios)
+    menu_summary = []
+    for recipe_id in recipe_ids:
+        recipe = engine.recipes[recipe_id]
+        recipe_portion = float(portions[recipe_id])
+        total_ingredients = {ing: round_amounts(weight * recipe_portion) for ing, weight in recipe["ingredients"].items()}
+        total_nutrition = engine.scaled_nutrition(recipe, recipe_portion)
+        menu_summary.append({
+            "name": recipe["name"],
+            "type": recipe["type"],
+            "calories": total_nutrition["熱量"],
+            "nutrition": total_nutrition,
+            "portions": recipe_portion,
+            "ingredients": total_ingredients
+        })
+    return menu_summary
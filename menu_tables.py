@@ -0,0 +1,58 @@
+import numpy as np
+
+from nutrient_schema import nutrient_column
+from nutrition_engine import NUTRIENT_KEYS
+
+# pandas 只在實際建立表格時才載入，只做選菜或批次處理的程式不需要付出載入成本
+# 營養欄位依菜單實際提供的營養素產生（見 nutrient_schema.py），欄名記錄在 table.attrs["nutrition_columns"]
+
+
+# 將菜單轉為陣列：營養素名稱、食材名稱、菜品 × 營養素、菜品 × 食材（克）
+def menu_arrays(menu):
+    keys = list(menu[0]["nutrition"]) if menu else list(NUTRIENT_KEYS)
+    ingredients = sorted({ingredient for item in menu for ingredient in item["ingredients"]})
+    ingredient_index = {name: i for i, name in enumerate(ingredients)}
+    amounts = np.zeros((len(menu), len(ingredients)))
+    nutrition = np.array([[item["nutrition"][key] for key in keys] for item in menu],
+                         dtype=np.float64).reshape(len(menu), len(keys))
+    for row, item in enumerate(menu):
+        for ingredient, amount in item["ingredients"].items():
+            amounts[row, ingredient_index[ingredient]] = amount
+    return keys, ingredients, nutrition, amounts
+
+
+# 構建營養成分和食材數量表格（數值欄位，含總計列；提供 total_people 時另加平均列）
+def build_nutrition_table_with_ingredients(menu, total_people=None, ingredient_suffix=""):
+    import pandas as pd
+
+    keys, ingredients, nutrition, amounts = menu_arrays(menu)
+    names = [item["name"] for item in menu] + ["總計"]
+    types = [item["type"] for item in menu] + ["全部"]
+    values = np.hstack([nutrition, amounts])
+    total = values.sum(axis=0)
+    rows = [values, np.round(total, 1)[None, :]]
+
+    # 添加平均行
+    if total_people is not None:
+        names.append("平均")
+        types.append("全部")
+        average = total / total_people if total_people > 0 else np.zeros_like(total)
+        rows.append(np.round(average, 2)[None, :])
+
+    nutrition_columns = [nutrient_column(key) for key in keys]
+    columns = nutrition_columns + [f"{ingredient}{ingredient_suffix}" for ingredient in ingredients]
+    table = pd.DataFrame(np.vstack(rows), columns=columns)
+    table.insert(0, "類型", types)
+    table.insert(0, "菜品", names)
+    table.attrs["nutrition_columns"] = nutrition_columns
+    return table
+
+
+# 顯示時才將食材欄位格式化為「X 克」，數值本身保持不變以便排序與匯出
+def format_ingredient_columns(table):
+    nutrition_columns = table.attrs["nutrition_columns"]
+    ingredient_columns = [column for column in table.columns[2:] if column not in nutrition_columns]
+    return table.style.format(
+        lambda amount: f"{round(amount, 1)} 克" if amount > 0 else "——",
+        subset=ingredient_columns,
+    ).format(precision=1, subset=nutrition_columns)
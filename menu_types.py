@@ -0,0 +1,135 @@
+import numpy as np
+
+from nutrition_engine import round_amounts
+from procurement import procurement_vocabulary
+
+# 精簡的菜品資料型別：以 __slots__ 取代巢狀 dict，營養素存成固定長度的浮點陣列，
+# 食材存成 (食材編號, 克數) 兩個陣列；名稱與類型字串與菜譜共用，不另外複製。
+# to_dict() 輸出與原本相同格式的 dict，供表格、JSON 與既有函式使用。
+
+
+class Ingredient:
+    __slots__ = ("id", "name", "nutrients")
+
+    def __init__(self, ingredient_id, name, nutrients):
+        self.id = ingredient_id
+        self.name = name
+        self.nutrients = nutrients  # 每 100 克的營養素，順序同 engine.nutrient_fields；營養表中沒有時為 0
+
+    def to_dict(self, nutrient_fields):
+        return {field: float(value) for field, value in zip(nutrient_fields, self.nutrients)}
+
+
+class Recipe:
+    __slots__ = ("id", "name", "type", "ingredient_ids", "grams")
+
+    def __init__(self, recipe_id, name, category, ingredient_ids, grams):
+        self.id = recipe_id
+        self.name = name
+        self.type = category
+        self.ingredient_ids = ingredient_ids
+        self.grams = grams
+
+    def to_dict(self, ingredient_names):
+        return {
+            "name": self.name,
+            "type": self.type,
+            "ingredients": {ingredient_names[i]: grams for i, grams in zip(self.ingredient_ids.tolist(), self.grams.tolist())},
+        }
+
+
+class MenuItem:
+    __slots__ = ("recipe_id", "name", "type", "portions", "nutrition", "ingredient_ids", "grams")
+
+    def __init__(self, recipe_id, name, category, portions, nutrition, ingredient_ids, grams):
+        self.recipe_id = recipe_id
+        self.name = name
+        self.type = category
+        self.portions = portions
+        self.nutrition = nutrition  # 放大後的營養素，順序同 engine.nutrient_keys
+        self.ingredient_ids = ingredient_ids
+        self.grams = grams  # 放大後的食材克數
+
+    @property
+    def calories(self):
+        return float(self.nutrition[0])
+
+    # 與 build_menu_item 相同格式的 dict
+    def to_dict(self, ingredient_names, nutrient_keys):
+        nutrition = dict(zip(nutrient_keys, self.nutrition.tolist()))
+        return {
+            "name": self.name,
+            "type": self.type,
+            "calories": nutrition["熱量"],
+            "nutrition": nutrition,
+            "portions": self.portions,
+            "ingredients": {ingredient_names[i]: grams for i, grams in zip(self.ingredient_ids.tolist(), self.grams.tolist())},
+        }
+
+
+# 由營養計算引擎建立的型別化菜品目錄；食材編號與 procurement_vocabulary 相同，可直接用於採購彙總
+class MenuCatalog:
+    def __init__(self, engine):
+        self.engine = engine
+        self.ingredient_names = procurement_vocabulary(engine)
+        self.ingredient_index = {name: i for i, name in enumerate(self.ingredient_names)}
+        catalog_size = len(engine.ingredient_names)
+        nutrients = np.zeros((len(self.ingredient_names), engine.nutrient_matrix.shape[1]))
+        nutrients[:catalog_size] = engine.nutrient_matrix
+        self.ingredients = [Ingredient(i, name, nutrients[i]) for i, name in enumerate(self.ingredient_names)]
+
+        self.recipes = []
+        for recipe_id, recipe in enumerate(engine.recipes):
+            ingredients = recipe["ingredients"]
+            ingredient_ids = np.fromiter((self.ingredient_index[name] for name in ingredients), dtype=np.int32,
+                                         count=len(ingredients))
+            grams = np.fromiter(ingredients.values(), dtype=np.float64, count=len(ingredients))
+            self.recipes.append(Recipe(recipe_id, recipe["name"], recipe["type"], ingredient_ids, grams))
+
+    # 多道菜一次計算：category_calories 為每道菜分配到的熱量，份數、營養與食材克數皆以陣列運算放大
+    # （計算方式同 build_menu_item）；熱量為 0 的菜品略過
+    def scaled_items(self, recipe_ids, category_calories, total_people=None):
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        nutrition = self.engine.recipe_nutrition_matrix[recipe_ids]
+        calories = nutrition[:, 0]
+        portions = round_amounts(np.divide(category_calories, calories, out=np.zeros(len(recipe_ids)),
+                                           where=calories != 0))
+        if total_people is not None:
+            portions = np.minimum(portions, total_people)
+        scaled_nutrition = round_amounts(nutrition * portions[:, None])
+
+        recipes = [self.recipes[recipe_id] for recipe_id in recipe_ids.tolist()]
+        lengths = [len(recipe.grams) for recipe in recipes]
+        grams = np.concatenate([recipe.grams for recipe in recipes]) if recipes else np.zeros(0)
+        scaled_grams = np.split(round_amounts(grams * np.repeat(portions, lengths)), np.cumsum(lengths)[:-1])
+        return [
+            MenuItem(recipe.id, recipe.name, recipe.type, float(portions[k]), scaled_nutrition[k],
+                     recipe.ingredient_ids, scaled_grams[k])
+            for k, recipe in enumerate(recipes)
+            if calories[k] != 0
+        ]
+
+    # 由既有的菜單 dict 轉為 MenuItem
+    def from_dict(self, item):
+        recipe = self.recipes[self.engine.recipe_index[item["name"]]]
+        ingredients = item["ingredients"]
+        return MenuItem(
+            recipe.id, recipe.name, recipe.type, item["portions"],
+            np.array([item["nutrition"][key] for key in self.engine.nutrient_keys], dtype=np.float64),
+            np.fromiter((self.ingredient_index[name] for name in ingredients), dtype=np.int32, count=len(ingredients)),
+            np.fromiter(ingredients.values(), dtype=np.float64, count=len(ingredients)),
+        )
+
+    def to_dicts(self, items):
+        return [item.to_dict(self.ingredient_names, self.engine.nutrient_keys) for item in items]
+
+    def from_dicts(self, menu):
+        return [self.from_dict(item) for item in menu]
+
+    # 多個菜單項目的食材總量（依食材編號的克數陣列）
+    def ingredient_grams(self, items):
+        if not items:
+            return np.zeros(len(self.ingredient_names))
+        ids = np.concatenate([item.ingredient_ids for item in items])
+        grams = np.concatenate([item.grams for item in items])
+        return np.bincount(ids, weights=grams, minlength=len(self.ingredient_names))
@@ -0,0 +1,80 @@
+import numpy as np
+
+# 營養素結構：營養表（ingredients_nutrition.json）中每種食材可提供任意數值欄位，
+# 引擎依營養表實際出現的欄位建立 食材 × 營養素 矩陣，所有營養素以同一次矩陣乘法算出。
+# 熱量與三大營養素固定在第 0～3 欄，其餘依 NUTRIENTS 的順序，未知的欄位以欄位名稱顯示、附加在最後。
+
+# 已知營養素：欄位 → (名稱, 單位)，數值皆為每 100 克含量
+NUTRIENTS = {
+    "calories": ("熱量", "kcal"),
+    "protein": ("蛋白質", "g"),
+    "fat": ("脂肪", "g"),
+    "carbs": ("碳水化合物", "g"),
+    "fiber": ("膳食纖維", "g"),
+    "sugar": ("糖", "g"),
+    "saturated_fat": ("飽和脂肪", "g"),
+    "trans_fat": ("反式脂肪", "g"),
+    "cholesterol": ("膽固醇", "mg"),
+    "water": ("水分", "g"),
+    "sodium": ("鈉", "mg"),
+    "potassium": ("鉀", "mg"),
+    "calcium": ("鈣", "mg"),
+    "magnesium": ("鎂", "mg"),
+    "phosphorus": ("磷", "mg"),
+    "iron": ("鐵", "mg"),
+    "zinc": ("鋅", "mg"),
+    "copper": ("銅", "mg"),
+    "manganese": ("錳", "mg"),
+    "selenium": ("硒", "µg"),
+    "iodine": ("碘", "µg"),
+    "vitamin_a": ("維生素A", "µg RE"),
+    "vitamin_d": ("維生素D", "µg"),
+    "vitamin_e": ("維生素E", "mg α-TE"),
+    "vitamin_k": ("維生素K", "µg"),
+    "vitamin_b1": ("維生素B1", "mg"),
+    "vitamin_b2": ("維生素B2", "mg"),
+    "niacin": ("菸鹼素", "mg NE"),
+    "vitamin_b6": ("維生素B6", "mg"),
+    "vitamin_b12": ("維生素B12", "µg"),
+    "folate": ("葉酸", "µg"),
+    "vitamin_c": ("維生素C", "mg"),
+}
+CORE_FIELDS = ["calories", "protein", "fat", "carbs"]
+
+# 營養素上下限（每 1000 大卡含量，None 表示不限）：午餐的鈉設上限，鈣與膳食纖維設下限。
+# 只檢查營養表中有提供的營養素
+NUTRIENT_LIMITS = {"鈉": (None, 1200), "鈣": (250, None), "膳食纖維": (8, None)}
+
+_UNITS = {name: unit for name, unit in NUTRIENTS.values()}
+
+
+# 營養表中出現的數值欄位，依矩陣欄位順序排列；核心四項即使沒有出現也保留
+def nutrient_fields(nutrition_data):
+    present = {}
+    for values in nutrition_data.values():
+        for field, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                present[field] = True
+    known = [field for field in NUTRIENTS if field in present and field not in CORE_FIELDS]
+    return CORE_FIELDS + known + [field for field in present if field not in NUTRIENTS]
+
+
+# 欄位的顯示名稱（菜單 dict 中 "nutrition" 的鍵）
+def nutrient_key(field):
+    return NUTRIENTS[field][0] if field in NUTRIENTS else field
+
+
+# 表格欄名，例如 "鈉 (mg)"
+def nutrient_column(key):
+    unit = _UNITS.get(key)
+    return f"{key} ({unit})" if unit else key
+
+
+# 有上下限且 nutrient_keys 中有提供的營養素：回傳 (名稱, 欄位編號, 每 1000 大卡的 [下限, 上限])，沒有的一側為 ±inf
+def limit_bands(nutrient_keys, limits=NUTRIENT_LIMITS):
+    keys = [key for key in limits if key in nutrient_keys]
+    bands = np.array([
+        [-np.inf if limits[key][0] is None else limits[key][0], np.inf if limits[key][1] is None else limits[key][1]]
+        for key in keys
+    ], dtype=np.float64).reshape(-1, 2)
+    return keys, [list(nutrient_keys).index(key) for key in keys], bands
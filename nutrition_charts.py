@@ -0,0 +1,67 @@
+import io
+from functools import lru_cache
+
+from menu_solver import RATIO_BANDS
+
+# 營養比例圖：每張圖使用獨立的 Figure（不經過 pyplot 的全域狀態），
+# 輸出 PNG 並依比例數值快取，相同比例不重複繪製；matplotlib 在第一次繪圖時才載入
+
+RATIO_COLORS = {"蛋白質": "#ff9999", "脂肪": "#66b3ff", "碳水化合物": "#99ff99"}
+BAND_COLORS = {"蛋白質": "red", "脂肪": "blue", "碳水化合物": "green"}
+
+
+def _figure(figsize):
+    from matplotlib.figure import Figure
+
+    return Figure(figsize=figsize)
+
+
+# 以半透明色帶標出各營養素的建議比例範圍
+def _draw_bands(ax):
+    for key, (low, high) in RATIO_BANDS.items():
+        ax.axhspan(low, high, color=BAND_COLORS[key], alpha=0.12, label=f"{key} {low}–{high}%")
+
+
+def _to_png(figure):
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png", dpi=100, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+# 單日營養比例長條圖；ratios 為 (蛋白質, 脂肪, 碳水化合物) 百分比
+@lru_cache(maxsize=256)
+def ratio_chart(ratios):
+    figure = _figure((6, 4))
+    ax = figure.subplots()
+    labels = list(RATIO_BANDS)
+    _draw_bands(ax)
+    ax.bar(labels, ratios, color=[RATIO_COLORS[key] for key in labels])
+    ax.set_ylabel("比例 (%)")
+    ax.set_title("每日營養成分比例")
+    ax.legend(loc="upper left", fontsize="small")
+    return _to_png(figure)
+
+
+# 整週營養比例合併為一張分組長條圖；week_ratios 為每天一組 (蛋白質, 脂肪, 碳水化合物)
+@lru_cache(maxsize=64)
+def week_ratio_chart(week_ratios, day_labels=None):
+    labels = list(RATIO_BANDS)
+    day_labels = day_labels or tuple(f"第 {day} 天" for day in range(1, len(week_ratios) + 1))
+    width = 0.8 / len(labels)
+    figure = _figure((max(6, 1.4 * len(week_ratios)), 4))
+    ax = figure.subplots()
+    _draw_bands(ax)
+    for i, key in enumerate(labels):
+        positions = [day + (i - (len(labels) - 1) / 2) * width for day in range(len(week_ratios))]
+        ax.bar(positions, [ratios[i] for ratios in week_ratios], width, color=RATIO_COLORS[key], label=key)
+    ax.set_xticks(range(len(week_ratios)))
+    ax.set_xticklabels(day_labels)
+    ax.set_ylabel("比例 (%)")
+    ax.set_title("整週營養成分比例")
+    ax.legend(loc="upper left", fontsize="small", ncol=2)
+    return _to_png(figure)
+
+
+# validate_nutrition_ratio 的結果轉為可快取的比例組
+def validation_ratios(validation):
+    return tuple(float(validation[key]) for key in RATIO_BANDS)
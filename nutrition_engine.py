@@ -0,0 +1,143 @@
+import numpy as np
+
+from ingredient_prices import price_vector, unpriced_ingredients
+from nutrient_schema import CORE_FIELDS, nutrient_fields, nutrient_key
+from recipe_tags import RecipeTagIndex
+
+# 核心營養素名稱（顯示用）與 ingredients_nutrition.json 中對應的欄位，固定為營養矩陣的前四欄；
+# 營養表提供的其他營養素接在其後（見 nutrient_schema.py 與 engine.nutrient_keys）
+NUTRIENT_KEYS = [nutrient_key(field) for field in CORE_FIELDS]
+NUTRIENT_FIELDS = list(CORE_FIELDS)
+
+
+# 份數、營養與食材克數共用的四捨五入（取到 digits 位，x.x5 一律進位），各路徑以同一方式計算結果才會一致。
+# 先以 np.round(..., 9) 消除乘法的浮點誤差（8.65 × 10 = 86.49999999999999 → 86.5），再 floor(x + 0.5)；
+# 數值皆為非負的份量。純量回傳 float，陣列回傳同形狀的陣列
+def round_amounts(values, digits=1):
+    scale = 10.0 ** digits
+    rounded = np.floor(np.round(np.asarray(values, dtype=np.float64) * scale, 9) + 0.5) / scale
+    return float(rounded) if rounded.ndim == 0 else rounded
+
+
+# 稀疏矩陣（CSR）乘以稠密矩陣
+def sparse_matmul(indptr, indices, weights, dense):
+    n_rows = len(indptr) - 1
+    rows = np.repeat(np.arange(n_rows), np.diff(indptr))
+    products = weights[:, None] * dense[indices]
+    result = np.empty((n_rows, dense.shape[1]), dtype=np.float64)
+    for column in range(dense.shape[1]):
+        result[:, column] = np.bincount(rows, weights=products[:, column], minlength=n_rows)
+    return result
+
+
+# 營養計算引擎：將食材營養表編譯為稠密矩陣，菜譜編譯為稀疏權重矩陣
+# aliases 將菜譜中的食材名稱對應到營養表中的名稱（例如 {"前腿肉": "豬下肩肉"}）
+# taxonomy 為食材分類（見 recipe_tags.py），用於建立菜品標籤索引；prices 為每公斤價格（見 ingredient_prices.py）
+class NutritionEngine:
+    def __init__(self, recipes, nutrition_data, aliases=None, taxonomy=None, prices=None):
+        self.recipes = recipes
+        self.aliases = aliases or {}
+        self.data_version = None  # 來源數據的雜湊，由 nutrition_index.load_engine 設定
+        self.ingredient_names = list(nutrition_data.keys())
+        self.ingredient_index = {name: i for i, name in enumerate(self.ingredient_names)}
+        self.nutrient_fields = nutrient_fields(nutrition_data)
+        self.nutrient_keys = [nutrient_key(field) for field in self.nutrient_fields]
+
+        # 食材 × 營養素（每 100 克）；食材缺少的欄位以 0 計
+        self.nutrient_matrix = np.array(
+            [[nutrition_data[name].get(field, 0) for field in self.nutrient_fields] for name in self.ingredient_names],
+            dtype=np.float64,
+        ).reshape(-1, len(self.nutrient_fields))
+
+        # 菜品 × 食材（克），以 CSR 格式儲存；營養表中找不到的食材記錄在 unresolved
+        self.recipe_index = {}
+        self.unresolved = {}
+        indptr = [0]
+        indices = []
+        weights = []
+        for recipe_id, recipe in enumerate(recipes):
+            self.recipe_index[recipe["name"]] = recipe_id
+            for ingredient, weight in recipe["ingredients"].items():
+                ingredient_id = self.ingredient_index.get(self.aliases.get(ingredient, ingredient))
+                if ingredient_id is None:
+                    self.unresolved.setdefault(ingredient, []).append(recipe["name"])
+                    continue
+                indices.append(ingredient_id)
+                weights.append(weight)
+            indptr.append(len(indices))
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int64)
+        self.weights = np.array(weights, dtype=np.float64)
+
+        # 所有菜品的營養成分與食材成本一次以矩陣乘法算出：價格（每 100 克）作為營養矩陣的最後一欄
+        # （每份；營養成分四捨五入到 0.1，成本不四捨五入）
+        price_column = self._load_prices(prices)
+        raw = sparse_matmul(self.indptr, self.indices, self.weights,
+                            np.column_stack([self.nutrient_matrix, price_column])) / 100
+        self.recipe_nutrition_matrix = np.round(raw[:, :-1], 1)
+        self.recipe_cost = raw[:, -1]
+
+        # 類型 → 菜品編號
+        self.category_index = {}
+        for recipe_id, recipe in enumerate(recipes):
+            self.category_index.setdefault(recipe["type"], []).append(recipe_id)
+        self.category_index = {
+            category: np.array(ids, dtype=np.int64) for category, ids in self.category_index.items()
+        }
+        self.tags = RecipeTagIndex(self, taxonomy or {})
+
+    # 由預先編譯好的陣列建立引擎，不重新計算（見 nutrition_index.py）
+    @classmethod
+    def from_arrays(cls, recipes, ingredient_names, nutrient_matrix, indptr, indices, weights,
+                    recipe_nutrition_matrix, category_index, unresolved, aliases, taxonomy=None, prices=None,
+                    nutrient_fields=CORE_FIELDS):
+        engine = cls.__new__(cls)
+        engine.recipes = recipes
+        engine.aliases = aliases
+        engine.data_version = None
+        engine.ingredient_names = ingredient_names
+        engine.ingredient_index = {name: i for i, name in enumerate(ingredient_names)}
+        engine.nutrient_fields = list(nutrient_fields)
+        engine.nutrient_keys = [nutrient_key(field) for field in engine.nutrient_fields]
+        engine.nutrient_matrix = nutrient_matrix
+        engine.recipe_index = {recipe["name"]: i for i, recipe in enumerate(recipes)}
+        engine.unresolved = unresolved
+        engine.indptr = indptr
+        engine.indices = indices
+        engine.weights = weights
+        engine.recipe_nutrition_matrix = recipe_nutrition_matrix
+        engine.category_index = category_index
+        engine.tags = RecipeTagIndex(engine, taxonomy or {})
+        engine.set_prices(prices)
+        return engine
+
+    # 記錄每公斤價格與缺少價格的食材（unpriced），回傳每 100 克價格欄
+    def _load_prices(self, prices):
+        self.ingredient_prices, priced = price_vector(self, prices or {})
+        self.unpriced = unpriced_ingredients(self, priced)
+        return self.ingredient_prices / 10
+
+    # 更新食材價格並重新計算每份成本，營養成分不變
+    def set_prices(self, prices):
+        price_column = self._load_prices(prices)
+        self.recipe_cost = sparse_matmul(self.indptr, self.indices, self.weights, price_column[:, None])[:, 0] / 100
+
+    # 取得菜品編號
+    def recipe_id(self, recipe):
+        return self.recipe_index[recipe["name"]]
+
+    # 單一菜品每份營養成分（與舊版 calculate_recipe_nutrition 相同格式，另含營養表提供的其他營養素）
+    def recipe_nutrition(self, recipe):
+        values = self.recipe_nutrition_matrix[self.recipe_id(recipe)]
+        return dict(zip(self.nutrient_keys, values.tolist()))
+
+    # 菜品依份數放大後的營養成分
+    def scaled_nutrition(self, recipe, portions):
+        values = round_amounts(self.recipe_nutrition_matrix[self.recipe_id(recipe)] * portions)
+        return dict(zip(self.nutrient_keys, values.tolist()))
+
+    # 菜單食材成本（元）；recipe_ids 與 portions 形狀為 (..., 菜品數)，可一次計算大量候選菜單
+    def menu_cost(self, recipe_ids, portions):
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        portions = np.asarray(portions, dtype=np.float64)
+        return np.einsum("...k,...k->...", portions, self.recipe_cost[recipe_ids])
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+from data_validation import DataValidationError, check_data, suggest_ingredients
+from ingredient_prices import default_prices_path, load_prices
+from nutrition_engine import NutritionEngine
+from recipe_tags import default_taxonomy_path, load_taxonomy
+
+# 預先編譯的營養索引：檔頭（JSON）＋對齊的陣列，可直接記憶體映射
+INDEX_PATH = "nutrition_index.bin"
+ALIASES_PATH = "ingredient_aliases.json"
+INDEX_MAGIC = b"LUNCHIDX"
+INDEX_VERSION = 3
+ALIGNMENT = 64
+
+
+# 計算來源檔案內容雜湊
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 來源檔案的大小、修改時間與雜湊；檔案不存在時為 None
+def source_signature(path):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_digest(path)}
+
+
+# 數據版本：菜譜、營養表、別名檔、食材分類檔與價格表內容雜湊的組合（檔案不存在時以 "-" 表示）
+def combine_digests(digests):
+    return hashlib.sha256("".join(digest or "-" for digest in digests).encode("ascii")).hexdigest()[:16]
+
+
+def optional_digest(path):
+    return file_digest(path) if os.path.exists(path) else None
+
+
+def data_version(recipes_path, nutrition_path, aliases_path, taxonomy_path, prices_path):
+    paths = (recipes_path, nutrition_path, aliases_path, taxonomy_path, prices_path)
+    return combine_digests(optional_digest(path) for path in paths)
+
+
+# 預設的食材別名檔：與 recipes.json 放在同一目錄
+def default_aliases_path(recipes_path):
+    return os.path.join(os.path.dirname(os.path.abspath(recipes_path)), ALIASES_PATH)
+
+
+# 讀取來源 JSON；別名檔可省略，其中以 "_" 開頭的鍵為說明文字，不是別名
+def load_sources(recipes_path, nutrition_path, aliases_path):
+    with open(recipes_path, "r", encoding="utf-8") as file:
+        recipes = json.load(file)
+    with open(nutrition_path, "r", encoding="utf-8") as file:
+        nutrition_data = json.load(file)
+    aliases = {}
+    if os.path.exists(aliases_path):
+        with open(aliases_path, "r", encoding="utf-8") as file:
+            aliases = {alias: target for alias, target in json.load(file).items() if not alias.startswith("_")}
+    return recipes, nutrition_data, aliases
+
+
+# 將菜譜、營養表與別名編譯為單一二進位索引；strict 時數據有誤即拋出 DataValidationError
+def build_index(recipes_path="recipes.json", nutrition_path="ingredients_nutrition.json", index_path=INDEX_PATH,
+                aliases_path=None, strict=True):
+    if aliases_path is None:
+        aliases_path = default_aliases_path(recipes_path)
+    recipes, nutrition_data, aliases = load_sources(recipes_path, nutrition_path, aliases_path)
+    if strict:
+        check_data(recipes, nutrition_data, aliases)
+    engine = NutritionEngine(recipes, nutrition_data, aliases)
+
+    # 食材詞彙：營養表中的食材在前，其他菜譜用到的名稱附加在後，並記錄各自對應的營養表編號（-1 為找不到）
+    extra_names = sorted({
+        ingredient for recipe in recipes for ingredient in recipe["ingredients"]
+        if ingredient not in engine.ingredient_index
+    })
+    vocabulary = engine.ingredient_names + extra_names
+    vocabulary_index = {name: i for i, name in enumerate(vocabulary)}
+    catalog_ids = [engine.ingredient_index.get(aliases.get(name, name), -1) for name in vocabulary]
+    recipe_indptr = [0]
+    recipe_ingredients = []
+    recipe_weights = []
+    for recipe in recipes:
+        for ingredient, weight in recipe["ingredients"].items():
+            recipe_ingredients.append(vocabulary_index[ingredient])
+            recipe_weights.append(weight)
+        recipe_indptr.append(len(recipe_ingredients))
+
+    categories = list(engine.category_index)
+    category_indptr = np.cumsum([0] + [len(engine.category_index[c]) for c in categories])
+    arrays = {
+        "nutrient_matrix": engine.nutrient_matrix,
+        "catalog_ids": np.array(catalog_ids, dtype=np.int64),
+        "recipe_nutrition": engine.recipe_nutrition_matrix,
+        "recipe_indptr": np.array(recipe_indptr, dtype=np.int64),
+        "recipe_ingredients": np.array(recipe_ingredients, dtype=np.int64),
+        "recipe_weights": np.array(recipe_weights, dtype=np.float64),
+        "category_indptr": category_indptr.astype(np.int64),
+        "category_recipes": np.concatenate(
+            [engine.category_index[c] for c in categories] or [np.zeros(0, dtype=np.int64)]
+        ),
+    }
+
+    header = {
+        "version": INDEX_VERSION,
+        "sources": {
+            "recipes": source_signature(recipes_path),
+            "nutrition": source_signature(nutrition_path),
+            "aliases": source_signature(aliases_path),
+        },
+        "recipe_names": [recipe["name"] for recipe in recipes],
+        "recipe_types": [recipe["type"] for recipe in recipes],
+        "ingredients": vocabulary,
+        "catalog_size": len(engine.ingredient_names),
+        "nutrient_fields": engine.nutrient_fields,
+        "aliases": aliases,
+        "categories": categories,
+        "arrays": {},
+    }
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    data_start = -(-(len(INDEX_MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+    # 先寫入暫存檔再替換，避免其他程序讀到寫一半的索引
+    # 寫入失敗（例如磁碟已滿）時刪除暫存檔再拋出
+    temp_path = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            file.write(INDEX_MAGIC)
+            file.write(len(header_bytes).to_bytes(8, "little"))
+            file.write(header_bytes)
+            for name, array in arrays.items():
+                file.seek(data_start + header["arrays"][name]["offset"])
+                file.write(array.tobytes())
+            file.truncate(data_start + offset)
+        os.replace(temp_path, index_path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return engine
+
+
+# 讀取索引檔頭與記憶體映射的陣列
+def load_index(index_path=INDEX_PATH):
+    with open(index_path, "rb") as file:
+        if file.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            raise ValueError(f"{index_path} 不是營養索引檔")
+        header_length = int.from_bytes(file.read(8), "little")
+        header = json.loads(file.read(header_length).decode("utf-8"))
+    if header.get("version") != INDEX_VERSION:
+        raise ValueError(f"{index_path} 的索引版本不符")
+
+    data_start = -(-(len(INDEX_MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+    buffer = np.memmap(index_path, dtype=np.uint8, mode="r")
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        start = data_start + spec["offset"]
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+    return header, arrays
+
+
+# 檢查索引是否仍對應目前的來源檔案；大小與修改時間相同時不重新計算雜湊
+def index_is_fresh(header, recipes_path, nutrition_path, aliases_path):
+    for key, path in (("recipes", recipes_path), ("nutrition", nutrition_path), ("aliases", aliases_path)):
+        recorded = header["sources"][key]
+        if recorded is None or not os.path.exists(path):
+            if recorded is None and not os.path.exists(path):
+                continue
+            return False
+        stat = os.stat(path)
+        if stat.st_size == recorded["size"] and stat.st_mtime_ns == recorded["mtime_ns"]:
+            continue
+        if stat.st_size != recorded["size"] or file_digest(path) != recorded["sha256"]:
+            return False
+    return True
+
+
+# 由索引建立營養計算引擎
+def engine_from_index(header, arrays, taxonomy=None, prices=None):
+    vocabulary = header["ingredients"]
+    catalog_size = header["catalog_size"]
+    indptr = arrays["recipe_indptr"]
+    ingredient_ids = arrays["recipe_ingredients"]
+    weights = arrays["recipe_weights"]
+    catalog_ids = arrays["catalog_ids"][ingredient_ids]
+
+    recipes = []
+    unresolved = {}
+    for recipe_id, (name, category) in enumerate(zip(header["recipe_names"], header["recipe_types"])):
+        start, end = indptr[recipe_id], indptr[recipe_id + 1]
+        ingredients = {}
+        for ingredient_id, weight in zip(ingredient_ids[start:end].tolist(), weights[start:end].tolist()):
+            ingredients[vocabulary[ingredient_id]] = weight
+            if arrays["catalog_ids"][ingredient_id] < 0:
+                unresolved.setdefault(vocabulary[ingredient_id], []).append(name)
+        recipes.append({"name": name, "type": category, "ingredients": ingredients})
+
+    # 只保留對應得到營養表的食材，作為引擎的稀疏權重矩陣
+    resolved = catalog_ids >= 0
+    resolved_indptr = np.concatenate([[0], np.cumsum(resolved)])[indptr]
+    category_indptr = arrays["category_indptr"]
+    category_index = {
+        category: arrays["category_recipes"][category_indptr[i]:category_indptr[i + 1]]
+        for i, category in enumerate(header["categories"])
+    }
+    return NutritionEngine.from_arrays(
+        recipes,
+        vocabulary[:catalog_size],
+        arrays["nutrient_matrix"],
+        resolved_indptr,
+        catalog_ids[resolved],
+        weights[resolved],
+        arrays["recipe_nutrition"],
+        category_index,
+        unresolved,
+        header["aliases"],
+        taxonomy,
+        prices,
+        header["nutrient_fields"],
+    )
+
+
+# 載入營養計算引擎：索引存在且未過期時直接映射，否則由 JSON 重新建立
+# strict 時若有食材對應不到營養表即拋出 DataValidationError，而不是默默略過
+def load_engine(recipes_path="recipes.json", nutrition_path="ingredients_nutrition.json", index_path=None,
+                aliases_path=None, strict=True, taxonomy_path=None, prices_path=None):
+    if index_path is None:
+        index_path = os.path.join(os.path.dirname(os.path.abspath(recipes_path)), INDEX_PATH)
+    if aliases_path is None:
+        aliases_path = default_aliases_path(recipes_path)
+    if taxonomy_path is None:
+        taxonomy_path = default_taxonomy_path(recipes_path)
+    if prices_path is None:
+        prices_path = default_prices_path(recipes_path)
+    taxonomy = load_taxonomy(taxonomy_path)  # 食材分類不編入索引，每次載入時建立標籤索引
+    prices = load_prices(prices_path)  # 價格經常調整，同樣不編入索引，每次載入時計算每份成本
+    engine = None
+    try:
+        header, arrays = load_index(index_path)
+        if index_is_fresh(header, recipes_path, nutrition_path, aliases_path):
+            engine = engine_from_index(header, arrays, taxonomy, prices)
+    except (OSError, ValueError, KeyError):
+        pass
+    if engine is None:
+        try:
+            build_index(recipes_path, nutrition_path, index_path, aliases_path, strict)
+            header, arrays = load_index(index_path)
+            engine = engine_from_index(header, arrays, taxonomy, prices)
+        except OSError:
+            # 無法寫入索引（權限不足、唯讀檔案系統等）時直接使用 JSON
+            header = None
+            recipes, nutrition_data, aliases = load_sources(recipes_path, nutrition_path, aliases_path)
+            if strict:
+                check_data(recipes, nutrition_data, aliases)
+            engine = NutritionEngine(recipes, nutrition_data, aliases, taxonomy, prices)
+    if header is not None:
+        sources = header["sources"]
+        engine.data_version = combine_digests([
+            *(sources[key]["sha256"] if sources[key] else None for key in ("recipes", "nutrition", "aliases")),
+            optional_digest(taxonomy_path),
+            optional_digest(prices_path),
+        ])
+    else:
+        engine.data_version = data_version(recipes_path, nutrition_path, aliases_path, taxonomy_path, prices_path)
+
+    if strict and engine.unresolved:
+        raise DataValidationError([
+            f"食材「{ingredient}」不在營養表中（用於 {'、'.join(names)}）；"
+            f"相近的食材：{'、'.join(suggest_ingredients(ingredient, engine.ingredient_names)) or '無'}"
+            for ingredient, names in engine.unresolved.items()
+        ])
+    return engine
+
+
+if __name__ == "__main__":
+    # 用法：python nutrition_index.py [recipes.json] [ingredients_nutrition.json] [輸出檔] [別名檔]
+    build_index(*sys.argv[1:5])
+    print(f"已建立營養索引：{sys.argv[3] if len(sys.argv) > 3 else INDEX_PATH}")
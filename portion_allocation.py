@@ -0,0 +1,94 @@
+import numpy as np
+
+# 依族群分配份量：以 族群 × 菜品 矩陣一次算出各族群每人的份數、盛裝克數與攝取量，不逐人計算。
+# 每道菜實際烹調的份數（菜單中的 portions，已含人數上限）依各族群的熱量佔比分給各族群：
+# 每人份數 = 菜品份數 × 族群午餐熱量 ÷ 全體午餐熱量（外積），各族群人數乘上此矩陣後的總和即為菜單的份數。
+# 各族群的份數都是同一向量的倍數，三大營養素比例與當日菜單完全相同，因此不另外逐族群檢查比例，
+# 比例是否合格以當日菜單的檢查（validate_nutrition_ratio）為準。
+
+
+class PortionAllocation:
+    def __init__(self, groups, dishes, counts, calories, portions, grams, nutrition):
+        self.groups = groups  # 族群名稱
+        self.dishes = dishes  # 菜名
+        self.counts = counts  # 各族群人數
+        self.calories = calories  # 各族群每人午餐熱量
+        self.portions = portions  # 族群 × 菜品：每人份數
+        self.grams = grams  # 族群 × 菜品：每人盛裝克數
+        self.nutrition = nutrition  # 族群 × 營養素：每人攝取量，順序同 engine.nutrient_keys
+
+    # 每道菜的總份數
+    @property
+    def total_portions(self):
+        return self.counts @ self.portions
+
+    # 可存成 JSON 的結果，只列出有人用餐的族群
+    def to_dict(self):
+        return {
+            "dishes": self.dishes,
+            "total_portions": np.round(self.total_portions, 1).tolist(),
+            "groups": {
+                group: {
+                    "count": int(self.counts[g]),
+                    "portions": np.round(self.portions[g], 2).tolist(),
+                    "grams": np.round(self.grams[g], 1).tolist(),
+                    "calories": round(float(self.nutrition[g, 0]), 1),
+                }
+                for g, group in enumerate(self.groups)
+                if self.counts[g] > 0
+            },
+        }
+
+    # 每個族群一列的表格資料（每人份數、克數與熱量），供 st.dataframe 顯示
+    def rows(self):
+        rows = []
+        for g, group in enumerate(self.groups):
+            if self.counts[g] == 0:
+                continue
+            row = {"族群": group, "人數": int(self.counts[g])}
+            for d, dish in enumerate(self.dishes):
+                row[f"{dish} 份數"] = round(float(self.portions[g, d]), 2)
+                row[f"{dish} (g)"] = round(float(self.grams[g, d]), 1)
+            row["每人熱量 (kcal)"] = round(float(self.nutrition[g, 0]), 1)
+            rows.append(row)
+        return rows
+
+
+# 將一組菜品的份數 dish_portions 分配給各族群；group_calories 為各族群每人午餐熱量，group_counts 未列出的族群視為 0 人
+def allocate_portions(engine, recipe_ids, dish_portions, group_calories, group_counts):
+    groups = list(group_calories)
+    calories = np.array([group_calories[group] for group in groups], dtype=np.float64)
+    counts = np.array([group_counts.get(group, 0) for group in groups], dtype=np.float64)
+    recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+
+    dish_nutrition = engine.recipe_nutrition_matrix[recipe_ids]
+    dish_grams = np.array([sum(engine.recipes[i]["ingredients"].values()) for i in recipe_ids.tolist()],
+                          dtype=np.float64)
+    total_calories = counts @ calories
+    shares = calories / total_calories if total_calories > 0 else np.zeros(len(groups))
+
+    portions = np.outer(shares, np.asarray(dish_portions, dtype=np.float64))
+    return PortionAllocation(
+        groups,
+        [engine.recipes[i]["name"] for i in recipe_ids.tolist()],
+        counts,
+        calories,
+        portions,
+        portions * dish_grams,
+        portions @ dish_nutrition,
+    )
+
+
+# 由菜單（build_menu_item 格式的 dict 清單）計算各族群份量
+def allocate_menu_portions(engine, menu, group_calories, group_counts):
+    return allocate_portions(engine, [engine.recipe_index[item["name"]] for item in menu],
+                             [item["portions"] for item in menu], group_calories, group_counts)
+
+
+# 週菜單每天的各族群份量（JSON 格式），供批次輸出與 API 使用
+def weekly_group_portions(engine, weekly_menu, group_calories, group_counts):
+    return {
+        day: allocate_menu_portions(engine, menu, group_calories, group_counts).to_dict()
+        for day, menu in weekly_menu.items()
+        if menu
+    }
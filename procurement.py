@@ -0,0 +1,100 @@
+import csv
+
+import numpy as np
+
+# 採購彙總：以數值陣列（場域 × 天 × 食材，單位克）累加各場域週菜單的食材用量，
+# 再依週、場域或供應商到貨日加總後輸出為公斤
+
+
+# 採購用的食材清單：營養表中的食材加上營養表沒有但菜譜用到的名稱（含以別名對應的食材）
+def procurement_vocabulary(engine):
+    extra = {
+        ingredient for recipe in engine.recipes for ingredient in recipe["ingredients"]
+        if ingredient not in engine.ingredient_index
+    }
+    return engine.ingredient_names + sorted(extra)
+
+
+# 將週菜單（{"Day n": [菜品, ...]}）轉為 天 × 食材 的克數陣列
+def menu_ingredient_matrix(weekly_menu, vocabulary_index):
+    grams = np.zeros((len(weekly_menu), len(vocabulary_index)))
+    for row, menu in enumerate(weekly_menu.values()):
+        for item in menu:
+            for ingredient, amount in item["ingredients"].items():
+                grams[row, vocabulary_index[ingredient]] += amount
+    return grams
+
+
+class ProcurementAggregator:
+    def __init__(self, vocabulary):
+        self.vocabulary = list(vocabulary)
+        self.vocabulary_index = {name: i for i, name in enumerate(self.vocabulary)}
+        self.sites = []
+        self.day_labels = None
+        self._grams = []
+
+    # 加入一個場域的週菜單
+    def add_site(self, site, weekly_menu):
+        day_labels = list(weekly_menu)
+        if self.day_labels is None:
+            self.day_labels = day_labels
+        elif day_labels != self.day_labels:
+            raise ValueError(f"{site} 的菜單天數與其他場域不一致")
+        self.sites.append(site)
+        self._grams.append(menu_ingredient_matrix(weekly_menu, self.vocabulary_index))
+
+    # 場域 × 天 × 食材（克）
+    def grams(self):
+        if not self._grams:
+            return np.zeros((0, 0, len(self.vocabulary)))
+        return np.stack(self._grams)
+
+    # 各場域整週用量：場域 × 食材（克）
+    def site_totals(self):
+        return self.grams().sum(axis=1)
+
+    # 所有場域整週用量（克）
+    def total(self):
+        return self.grams().sum(axis=(0, 1))
+
+    # 依到貨日加總；delivery_days 為每個菜單天對應的到貨日（例如 [1, 1, 3, 3, 3]）
+    # 回傳 (到貨日清單, 場域 × 到貨日 × 食材 的克數陣列)
+    def by_delivery_day(self, delivery_days=None):
+        grams = self.grams()
+        if delivery_days is None:
+            delivery_days = list(range(1, grams.shape[1] + 1))
+        if len(delivery_days) != grams.shape[1]:
+            raise ValueError("到貨日數量必須與菜單天數相同")
+        labels = sorted(set(delivery_days))
+        columns = np.searchsorted(labels, delivery_days)
+        result = np.zeros((grams.shape[0], len(labels), grams.shape[2]))
+        np.add.at(result, (slice(None), columns), grams)
+        return labels, result
+
+    # 長表格式資料列（場域, 到貨日, 食材, 公斤），只列出用量大於 0 的項目
+    def rows(self, delivery_days=None):
+        labels, grams = self.by_delivery_day(delivery_days)
+        site_ids, delivery_ids, ingredient_ids = np.nonzero(grams)
+        kilograms = np.round(grams[site_ids, delivery_ids, ingredient_ids] / 1000, 3)
+        for site_id, delivery_id, ingredient_id, kg in zip(
+            site_ids.tolist(), delivery_ids.tolist(), ingredient_ids.tolist(), kilograms.tolist()
+        ):
+            yield self.sites[site_id], labels[delivery_id], self.vocabulary[ingredient_id], kg
+
+    # 輸出 CSV 或 Parquet（依副檔名；Parquet 需要 pyarrow）
+    def export(self, path, delivery_days=None):
+        columns = ["site", "delivery_day", "ingredient", "kg"]
+        if path.endswith(".parquet"):
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("輸出 Parquet 需要安裝 pyarrow") from None
+            data = list(zip(*self.rows(delivery_days))) or [[], [], [], []]
+            table = pa.table({name: list(values) for name, values in zip(columns, data)})
+            pq.write_table(table, path, compression="zstd")
+            return
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            writer.writerows(self.rows(delivery_days))
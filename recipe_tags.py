@@ -0,0 +1,100 @@
+import json
+import os
+
+import numpy as np
+
+# 食材分類：食材 → 標籤（肉品來源、過敏原、飲食限制，例如 {"豬絞肉": ["豬肉", "肉類"]}），
+# 菜品的標籤為其所有食材標籤的聯集，另以菜品類型（主食、主菜…）作為標籤。
+# 每個標籤預先建立菜品編號的位元集合（np.packbits 的 uint8 陣列），
+# 「雞肉主菜、不含蛋與海鮮、本週未用過」之類的查詢只需位元集合的交集。
+
+TAXONOMY_PATH = "ingredient_taxonomy.json"
+
+# 飲食限制需排除的標籤
+DIET_EXCLUDES = {
+    "蛋奶素": ["肉類", "海鮮"],
+    "全素": ["肉類", "海鮮", "蛋", "牛奶"],
+    "不含豬肉": ["豬肉"],
+}
+
+
+# 預設的食材分類檔：與 recipes.json 放在同一目錄
+def default_taxonomy_path(recipes_path):
+    return os.path.join(os.path.dirname(os.path.abspath(recipes_path)), TAXONOMY_PATH)
+
+
+# 讀取食材分類；檔案不存在時沒有任何食材標籤
+def load_taxonomy(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+class RecipeTagIndex:
+    def __init__(self, engine, taxonomy):
+        self.size = len(engine.recipes)
+        self.empty = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        self.full = np.packbits(np.ones(self.size, dtype=bool))
+
+        # 食材 × 標籤：分類中的名稱可為別名，依引擎的別名對應到營養表中的食材
+        ingredient_tags = {}
+        for name, tags in taxonomy.items():
+            ingredient_id = engine.ingredient_index.get(engine.aliases.get(name, name))
+            if ingredient_id is None:
+                continue
+            for tag in tags:
+                if tag not in ingredient_tags:
+                    ingredient_tags[tag] = np.zeros(len(engine.ingredient_names), dtype=bool)
+                ingredient_tags[tag][ingredient_id] = True
+
+        # 以菜品 × 食材的 CSR 結構一次標記含有該標籤食材的菜品
+        entry_recipes = np.repeat(np.arange(self.size), np.diff(engine.indptr))
+        self.bitsets = {}
+        for tag, ingredients in ingredient_tags.items():
+            mask = np.zeros(self.size, dtype=bool)
+            mask[entry_recipes[ingredients[engine.indices]]] = True
+            self.bitsets[tag] = np.packbits(mask)
+        for category, recipe_ids in engine.category_index.items():
+            self.bitsets[category] = self.from_ids(recipe_ids)
+        self.categories = list(engine.category_index)
+
+    # 食材標籤（不含菜品類型）
+    @property
+    def tags(self):
+        return sorted(tag for tag in self.bitsets if tag not in self.categories)
+
+    # 標籤的位元集合；未知的標籤沒有任何菜品
+    def bitset(self, tag):
+        return self.bitsets.get(tag, self.empty)
+
+    def from_ids(self, recipe_ids):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[np.asarray(recipe_ids, dtype=np.int64)] = True
+        return np.packbits(mask)
+
+    def mask(self, bits):
+        return np.unpackbits(bits, count=self.size).view(bool)
+
+    def ids(self, bits):
+        return np.flatnonzero(self.mask(bits))
+
+    def count(self, bits):
+        return int(np.count_nonzero(self.mask(bits)))
+
+    # 含有 include 所有標籤、不含 exclude 任何標籤的菜品；within 為限定範圍的位元集合
+    def query(self, include=(), exclude=(), within=None):
+        bits = (self.full if within is None else within).copy()
+        for tag in include:
+            bits &= self.bitset(tag)
+        for tag in exclude:
+            bits &= ~self.bitset(tag)
+        return bits
+
+
+# 個別排除的標籤與飲食限制合併為不重複的排除清單
+def excluded_tags(tags=(), diets=()):
+    unknown = [diet for diet in diets if diet not in DIET_EXCLUDES]
+    if unknown:
+        raise ValueError(f"未知的飲食限制：{'、'.join(unknown)}")
+    return list(dict.fromkeys([*tags, *(tag for diet in diets for tag in DIET_EXCLUDES[diet])]))
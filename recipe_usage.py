@@ -0,0 +1,28 @@
+import numpy as np
+
+NEVER_USED = -1
+
+
+# 已使用菜品記錄：以菜品編號（recipes.json 中的位置）記錄最後使用的天數
+# repeat_window 為 None 時整個計畫期間不重複；為 N 時同一道菜 N 天內不重複
+class RecipeUsage:
+    def __init__(self, recipe_count, repeat_window=None):
+        self.last_used = np.full(recipe_count, NEVER_USED, dtype=np.int64)
+        self.repeat_window = repeat_window
+
+    # 記錄菜品在某天被使用
+    def mark(self, recipe_id, day):
+        self.last_used[recipe_id] = day
+
+    # 某天可用的菜品遮罩
+    def available_mask(self, recipe_ids, day):
+        last_used = self.last_used[recipe_ids]
+        free = last_used == NEVER_USED
+        if self.repeat_window is not None:
+            free |= day - last_used > self.repeat_window
+        return free
+
+    # 篩選某天可用的菜品編號
+    def available(self, recipe_ids, day):
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        return recipe_ids[self.available_mask(recipe_ids, day)]
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from menu_planner import CALORIES_PER_DAY
+
+# 生成結果快取：以輸入內容（正規化的人數、隨機種子、求解設定、數據版本）的雜湊為鍵，
+# 記憶體中保留最近使用的結果（LRU），另可寫入磁碟目錄供其他程序或重新啟動後使用。
+# 結果必須可序列化為 JSON，取得的結果為共用物件，請勿修改；隨機選菜沒有指定種子時結果不可重現，不應放入快取。
+
+DEFAULT_MEMORY_ITEMS = 256
+DEFAULT_DISK_BYTES = 256 * 2 ** 20
+
+
+# 各族群人數依固定順序排列，未列出的族群視為 0
+def normalize_group_counts(group_counts):
+    return [int(group_counts.get(group, 0)) for group in CALORIES_PER_DAY]
+
+
+# 結果鍵：kind 為結果種類（例如 "weekly-menu"），其餘參數需可轉為 JSON
+def result_key(kind, group_counts, seed, settings, data_version):
+    content = json.dumps(
+        {
+            "kind": kind,
+            "group_counts": normalize_group_counts(group_counts),
+            "seed": seed,
+            "settings": settings,
+            "data": data_version,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory=None, memory_items=DEFAULT_MEMORY_ITEMS, disk_bytes=DEFAULT_DISK_BYTES):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    # 取得結果；找不到時回傳 None
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._memory[key]
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    value = json.load(file)
+                os.utime(path)  # 以修改時間記錄最近使用，作為磁碟淘汰順序
+            except (OSError, ValueError):
+                pass
+            else:
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                self._remember(key, value)
+                return value
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.directory is None:
+            return
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        temp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            return
+        self._evict_disk()
+
+    # 有快取時直接回傳，否則計算後存入
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    # 磁碟總大小超過上限時，從最久未使用的檔案開始刪除
+    def _evict_disk(self):
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(".json"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.directory is not None:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name.endswith(".json"):
+                        os.remove(entry.path)